@@ -59,66 +59,72 @@ class Bindings:
             return False
 
     def get_themes_name(self) -> list[str]:
-        """Return a list of the existing user themes."""
+        """Return a sorted list of the existing user themes, from the catalog of the themes directory."""
 
         if not os.path.exists(self.__paths._themes_dir):
             return []
 
-        filenames = os.listdir(self.__paths._themes_dir)
-        if len(filenames) == 0:
-            return []
+        from Theme.Catalog import get_catalog
 
-        names = []
-        for filename in filenames:
-            if filename.endswith('.cfg'):
+        return get_catalog(self.__paths._themes_dir).get_names()
 
-                path = self.__paths._themes_dir + filename
+    def export_theme_pack(self, pack_path: str) -> None | list[str]:
+        """Write all the user themes to a theme pack (see `Theme.pack`), and return their names."""
 
-                with open(path, mode='rt', encoding='utf-8') as f:
-                    lines = f.readlines()
+        from Theme.pack import export_pack
 
-                for line in lines:
-                    variables = line.strip().split('=')
-                    if len(variables) == 2:
-                        var_name = variables[0]
-                        var_arg = variables[1]
-                        if var_name == 'name':
-                            if var_arg == '':
-                                name = os.path.basename(path)
-                            else:
-                                name = var_arg
+        try:
+            return export_pack(self.__paths._themes_dir, pack_path)
+        except OSError:
+            print_error(format_exc())
+            return None
 
-                            if name.endswith('.cfg'):
-                                name = name[:-4]
+    def import_theme_pack(self, pack_path: str, overwrite: bool = False) -> None | list[dict]:
+        """
+            Import the themes of a theme pack to the user themes, they are validated against the
+            default computer. Return the report of `Theme.pack.import_pack`, or None if the pack
+            could not be imported.
+        """
 
-                            names.append(name)
-                            break
+        import Computer.factory as computer_factory
+        from Theme.pack import import_pack
 
-        names.sort()
+        computer = computer_factory.get_default_computer()
+        if computer is None:
+            print_warning("There is no default computer.")
+            return None
 
-        return names
+        try:
+            return import_pack(computer, self.__paths._themes_dir, pack_path, overwrite)
+        except (ValueError, OSError):
+            print_error(format_exc())
+            return None
 
-    def set_theme(self, theme_name: str) -> bool:
-        """Set a theme by name."""
+    def set_theme(self, theme_name: str, wait: bool = False) -> bool:
+        """
+            Set a theme by name. By default, the Daemon returns as soon as the request
+            is accepted, use `wait=True` to return once the theme is written to the device.
+        """
 
-        status = self.__command('set_theme', theme_name)
+        status = self.__command('set_theme', theme_name, wait)
         if status is None:
             status = False
 
         return status
 
-    def switch_lights(self) -> None:
+    def switch_lights(self, wait: bool = False) -> None:
         """Switch the lights on or off."""
-        self.__command('switch_lights')
+        self.__command('switch_lights', wait)
 
-    def set_lights(self, state: bool) -> None:
+    def set_lights(self, state: bool, wait: bool = False) -> None:
         """Set the lights on or off."""
 
-        self.__command('set_lights', state)
+        self.__command('set_lights', state, wait)
 
     def set_fixed_mode(self,
                        colors: list[str],
-                       speed: int = 1) -> bool:
+                       speed: int = 1,
+                       wait: bool = False) -> bool:
         """
             Change all the light areas with the fixed mode. Each color of the list will
             be set in all the areas, and it will move to the next value depending on the speed.
@@ -128,38 +134,42 @@ class Bindings:
 
             :param list[str] colors: A list of Hex colors.
             :param int speed: Speed for switching each areaitem to the next color, 1 =< speed >= 256.
+            :param bool wait: Return once the colors are written to the device.
         """
 
         if len(colors) == 0:
             raise ValueError("The list of colors can not be empty.")
 
-        status = self.__command('set_colors', 'fixed', speed, colors, None)
+        status = self.__command('set_colors', 'fixed', speed, colors, None, wait)
         if status is None:
             status = False
         return status
 
     def set_blink_mode(self,
                        colors: list[str],
-                       speed: int = 50) -> bool:
+                       speed: int = 50,
+                       wait: bool = False) -> bool:
         """
             Change all the light areas, with the blink mode. Each color of the list will
             be set in all the areas, and it will blink depending on the speed.
 
             :param list[str] colors: A list of Hex colors.
             :param int speed: Speed for blinking, 1 =< speed >= 256.
+            :param bool wait: Return once the colors are written to the device.
         """
 
         if len(colors) == 0:
             raise ValueError("The list of colors can not be empty.")
 
-        status = self.__command('set_colors', 'blink', speed, colors, None)
+        status = self.__command('set_colors', 'blink', speed, colors, None, wait)
         if status is None:
             status = False
         return status
 
     def set_morph_mode(self,
                        colors: list[tuple[str, str], ...],
-                       speed: int = 50) -> bool:
+                       speed: int = 50,
+                       wait: bool = False) -> bool:
         """
             Change all the light areas, with the morph mode. Each color pair of the list will
             be set in all the areas, and it will create a gradient from the first color, to
@@ -167,6 +177,7 @@ class Bindings:
 
             :param list[tuple[str, str]] colors: A list of lists containing two values of Hex colors.
             :param int speed: Speed for switching each areaitem to the next color, 1 =< speed >= 256.
+            :param bool wait: Return once the colors are written to the device.
         """
 
         if len(colors) == 0:
@@ -179,8 +190,40 @@ class Bindings:
             left_colors.append(left_color)
             right_colors.append(right_color)
 
-        status = self.__command('set_colors', "morph", speed, left_colors, right_colors)
+        status = self.__command('set_colors', "morph", speed, left_colors, right_colors, wait)
+
+        if status is None:
+            status = False
+
+        return status
+
+    def modify_areaitem(self,
+                        theme_name: str,
+                        area_name: str,
+                        column: int,
+                        left_color: str,
+                        right_color: str,
+                        mode: str,
+                        wait: bool = False) -> bool:
+        """
+            Modify an AreaItem of the theme that is lit, and only write its color to the device.
+            It returns False if the lights are off, or if the theme is not the current one.
+        """
+
+        status = self.__command('modify_areaitem', theme_name, area_name, column, left_color, right_color, mode, wait)
+        if status is None:
+            status = False
+
+        return status
 
+    def apply_theme_diff(self, theme_name: str, diff: dict, wait: bool = False) -> bool:
+        """
+            Apply a diff (see `Theme.diff.diff_themes`) to the theme that is lit, and only write the
+            changes to the device. It returns False if the lights are off, if the theme is not the
+            current one, or if the diff does not match the theme.
+        """
+
+        status = self.__command('apply_theme_diff', theme_name, diff, wait)
         if status is None:
             status = False
 
@@ -203,6 +246,39 @@ class Bindings:
         """Reload the configurations for the current user."""
         self.__command('reload_themes')
 
+    def get_verification_report(self) -> list[dict]:
+        """
+            Return the report of the verification of the last theme or colors request: a list of
+            dictionaries {region, slot, problem, fallback} for each color that was adapted to the
+            regions of the computer (unsupported mode, or more colors than `max_commands`). When a
+            loop is a repetition of a shorter sequence of colors, its extra colors are "folded"
+            (the animation does not change), otherwise they are "dropped".
+        """
+
+        report = self.__command('get_verification_report')
+        if report is None:
+            report = []
+
+        return report
+
+    def get_commands_cache_stats(self) -> dict[str, int | float]:
+        """Return the hits, misses, hit rate and size of the cache of the compiled themes of the Daemon."""
+
+        stats = self.__command('get_commands_cache_stats')
+        if stats is None:
+            stats = {}
+
+        return stats
+
+    def get_themes_cache_stats(self) -> dict[str, int | float]:
+        """Return the hits, misses, hit rate and size of the cache of the parsed themes of the Daemon."""
+
+        stats = self.__command('get_themes_cache_stats')
+        if stats is None:
+            stats = {}
+
+        return stats
+
     def reload_address(self, verbose: bool=False) -> bool:
         """Reload the pyro address and try to make a connection with the Daemon."""
 
@@ -246,7 +322,13 @@ class Bindings:
 
     def __command(self, command: str, *args):
         """Send a command to the daemon."""
-        if command in ('set_theme', 'set_lights', 'switch_lights', 'reload_themes', 'connect_indicator'):
+        if command in ('set_theme',
+                       'set_lights',
+                       'switch_lights',
+                       'modify_areaitem',
+                       'apply_theme_diff',
+                       'reload_themes',
+                       'connect_indicator'):
             args = [self.__user] + list(args)
 
         if self.__pyro_address == "":
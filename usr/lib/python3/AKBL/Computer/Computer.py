@@ -46,6 +46,11 @@ class Computer:
         self.start_byte = 2
         self.fill_byte = 0
 
+        # When enabled (THROUGHPUT_MODE = 1 on the COMMON section), the commands are streamed
+        # and the status is only checked before the `command_transmit_execute`. It should only
+        # be enabled on the models where it has been validated.
+        self.throughput_mode = 0
+
         self.state_ready = 16
         self.state_busy = 17
         self.state_unknown_command = 18
@@ -100,6 +105,15 @@ class Computer:
 
         self.__regions[new_region._name] = new_region
 
+    def get_power_blocks(self) -> dict[str, int]:
+        """Return the blocks of the power states (standby, ac_power, etc.), by name."""
+        return {'standby': self.block_standby,
+                'ac_power': self.block_ac_power,
+                'charging': self.block_charging,
+                'battery_sleeping': self.block_battery_sleeping,
+                'battery_power': self.block_battery_power,
+                'battery_critical': self.block_battery_critical}
+
     def get_regions(self) -> list[Region]:
         return list(self.__regions.values())
 
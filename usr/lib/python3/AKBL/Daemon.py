@@ -24,6 +24,8 @@
 
 import os
 import sys
+import hashlib
+from typing import Callable
 from traceback import format_exc
 
 try:
@@ -42,18 +44,24 @@ if akbl_path not in sys.path:
 from Paths import Paths
 from CCParser import CCParser
 from Bindings import Bindings
+from LRUCache import LRUCache
 from settings import IndicatorCodes
 from utils import string_is_hex_color, getuser
+from Engine.Worker import Worker, Job
 from Engine.Controller import Controller
+from Engine.Poller import PollStatus
+from Engine.Verifier import verify_theme, verify_colors, get_report_text
 from Theme.Theme import Theme
 from Theme import factory as theme_factory
+from Theme.binary import _BINARY_EXTENSION
+from Theme.diff import diff_themes, patch_theme, diff_is_empty, DiffOperations
 import Computer.factory as computer_factory
 from console_printer import print_warning, print_error, print_info, print_debug
 
 
 class Daemon:
 
-    def __init__(self, fake=False):
+    def __init__(self, fake=False, backend='pyusb'):
 
         self.__fake = fake
         self.__computer = computer_factory.get_default_computer()
@@ -64,25 +72,51 @@ class Daemon:
 
         print_info("Starting the computer configuration '{}'.".format(self.__computer.name))
 
-        self.__controller = Controller(self.__computer, fake=fake)
+        self.__controller = Controller(self.__computer,
+                                       fake=fake,
+                                       delta_uploads=True,
+                                       backend=backend,
+                                       saved_blocks_file=None if fake else Paths()._saved_blocks_file,
+                                       coalesce_regions=True)
+
+        # All the USB I/O is done by the worker thread, the RPCs only submit jobs to it.
+        self.__worker = Worker()
+
+        # The themes are cached by (path, mtime, size) with the hash of their content, and the
+        # commands of their blocks by (computer, theme content hash, block, save). The computer is
+        # identified by the stat of its configuration file, so the cached commands are discarded
+        # if it changes.
+        self.__themes_cache = LRUCache(max_size=32)
+        self.__commands_cache = LRUCache(max_size=64)
+        self.__computer_key = self.__get_computer_key()
 
         #                                  Save, BLock
         self.__computer_blocks_to_save = ((True, self.__computer.block_load_on_boot),
                                           (False, self.__computer.block_load_on_boot))
 
-        # (True, self.__computer.BLOCK_STANDBY),
-        # (True, self.__computer.block_ac_power),
-        # (#True, self.__computer.block_charging),
-        # (True, self.__computer.block_battery_sleeping),
-        # (True, self.__computer.block_battery_power),
-        # (True, self.__computer.block_battery_critical),
+        # The themes can also program the blocks of the power states (standby, ac_power, charging,
+        # battery_sleeping, battery_power, battery_critical), see `__get_blocks_to_save()`.
 
         self.__user = ""  # To force the reload
         self.__lights_state = False
         self.__pyro_indicator = None
         self.__ccp = None
         self.__theme = None
+        self.__theme_hash = None
         self.__paths = None
+        self.__verification_report = []
+
+        # (area name, column): (loop index, slot) of the colors of the theme in the live block,
+        # used to patch a single AreaItem without writing all the blocks again. It is None
+        # when the theme is not lit (lights off, or colors set by `set_colors`).
+        self.__areaitems_index = None
+
+        # The jobs can be superseded, so the patches are the diff between the theme of the live block
+        # and the last theme, computed by the worker. The applies that write all the blocks are numbered,
+        # and a patch is only written if the last one that was submitted before it was executed.
+        self.__lit_theme = None
+        self.__submitted_applies = 0
+        self.__executed_apply = 0
 
         self.reload_themes(getuser())
 
@@ -111,6 +145,7 @@ class Daemon:
             self.__user = user
             self.__paths = Paths(user)
             self.__ccp = CCParser(self.__paths._configuration_file, 'GUI Configuration')
+            theme_factory.watch_themes_dir(self.__paths._themes_dir)
 
             # Do not mark as "active" the theme of the indicator.
             indicator_theme_state = False
@@ -118,12 +153,12 @@ class Daemon:
             last_theme_name = theme_factory.get_last_theme_name(self.__paths._themes_dir)
             if last_theme_name is None:
                 self.__theme = Theme(self.__computer)
+                self.__theme_hash = None
                 print_debug(f"there is no default theme.", direct_output=True)
             else:
                 print_debug(f"default theme={last_theme_name}", direct_output=True)
-                self.__theme = theme_factory.get_theme_by_name(self.__computer,
-                                                               self.__paths._themes_dir,
-                                                               last_theme_name)
+                self.__theme, self.__theme_hash = self.__load_theme(os.path.join(self.__paths._themes_dir,
+                                                                                 last_theme_name + '.cfg'))
 
         if self.__pyro_indicator is not None:
             try:
@@ -137,14 +172,18 @@ class Daemon:
     """
 
     @pyro_server_expose
-    def switch_lights(self, user: str):
+    def switch_lights(self, user: str, wait: bool = False) -> bool:
         """Toggle on/off the lights of the keyboard."""
         print_debug(f"user={user}")
-        self.set_lights(user, not self.__lights_state)
+        return self.set_lights(user, not self.__lights_state, wait)
 
     @pyro_server_expose
-    def set_theme(self, user: str, theme_name: str) -> bool:
-        """Set a theme by name."""
+    def set_theme(self, user: str, theme_name: str, wait: bool = False) -> bool:
+        """
+            Set a theme by name.
+
+            :param bool wait: Wait until the theme is written to the device.
+        """
 
         print_debug(f"user={user} theme_name={theme_name}")
 
@@ -152,80 +191,69 @@ class Daemon:
             self.__user = user
             self.__paths = Paths(user)
 
-        if not theme_name.endswith(".cfg"):
-            theme_name += ".cfg"
-
         theme_path = os.path.join(self.__paths._themes_dir, theme_name)
 
+        # The format is picked by the extension, by default the .cfg themes are preferred.
+        if not theme_name.endswith((".cfg", _BINARY_EXTENSION)):
+            if os.path.exists(theme_path + ".cfg") or not os.path.exists(theme_path + _BINARY_EXTENSION):
+                theme_path += ".cfg"
+            else:
+                theme_path += _BINARY_EXTENSION
+
         if not os.path.exists(theme_path):
             print_warning(f"The theme does not exist = {theme_path}")
             return False
 
-        theme = theme_factory.load_theme_from_file(self.__computer, theme_path)
+        theme, theme_hash = self.__load_theme(theme_path)
         if theme is None:
             print_warning("The theme could not be reloaded.")
             return False
 
         self.__theme = theme
-        self.__illuminate_keyboard()
+        self.__theme_hash = theme_hash
+        self.__lights_state = True
+        plan = self.__set_verification_report(*verify_theme(self.__computer, theme))
+        job = self.__submit_apply(self.__illuminate_keyboard, theme, plan, theme_hash)
+
+        if wait:
+            return job.wait() is True
+
         return True
 
     @pyro_server_expose
-    def set_lights(self, user: str, state: bool) -> None:
-        """Set the lights on or off."""
+    def set_lights(self, user: str, state: bool, wait: bool = False) -> bool:
+        """
+            Set the lights on or off.
+
+            :param bool wait: Wait until the lights are written to the device.
+        """
 
         print_debug(f"user={user} state={state}")
 
         if user != self.__user:
             self.reload_themes(user)
 
-        if not state:
+        self.__lights_state = state
 
+        if state:
+            plan = self.__set_verification_report(*verify_theme(self.__computer, self.__theme))
+            job = self.__submit_apply(self.__illuminate_keyboard, self.__theme, plan, self.__theme_hash)
+        else:
             areas_to_keep_on = self.__ccp.get_str_defval('areas_to_keep_on', '')
+            job = self.__submit_apply(self.__turn_off_lights, self.__theme, areas_to_keep_on)
 
-            if areas_to_keep_on == '':
-
-                self.__controller.clear_constructor()
-
-                for save, block in self.__computer_blocks_to_save:
-                    self.__controller.add_block_line(save, block)
-                    self.__controller.add_reset_line(self.__computer.reset_all_lights_off)
-
-                self.__controller.apply_config()
-            else:
-                #
-                # To turn off the lights but let some areas on, instead of sending
-                # the command "all the lights off", some areas are set to black color.
-                #
-
-                areas_to_keep_on = areas_to_keep_on.split('|')
-
-                self.__controller.clear_constructor()
-                for save, block in self.__computer_blocks_to_save:
-
-                    self.__controller.add_block_line(save, block)
-                    self.__controller.add_reset_line(self.__computer.reset_all_lights_on)
-                    self.__controller.add_speed_line(1)
-
-                    for area in self.__theme.get_areas():
-                        if area._name not in areas_to_keep_on:
-                            for areaitem in area.get_items():
-                                self.__controller.add_color_line(areaitem.get_hex_id(), 'fixed', '#000000', '#000000')
-                            self.__controller.end_colors_line()
-                    self.__controller.end_block_line()
-                self.__controller.apply_config()
+        if wait:
+            return job.wait() is True
 
-            self.__lights_state = False
-            self.__indicator_send_code(IndicatorCodes._lights_off)
-        else:
-            self.__illuminate_keyboard()
+        return True
 
     @pyro_server_expose
     def set_colors(self,
                    mode: str,
                    speed: int,
                    left_colors: list[str],
-                   right_colors: None | list[str] = None) -> bool:
+                   right_colors: None | list[str] = None,
+                   wait: bool = False) -> bool:
         """
             Change the colors and the mode of the keyboard.
 
@@ -235,6 +263,7 @@ class Daemon:
             :param None|list[str] right_colors:
                 It will be used only of the modes are 'morph' or 'fixed'.
                 It must be a list of hex_colors, with the same length as left_colors.
+            :param bool wait: Wait until the colors are written to the device.
 
 
             #TODO: Check why right_colors is in blink mode?
@@ -281,52 +310,75 @@ class Daemon:
                     print_warning(f"The colors argument must only contain hex colors. The color={color} is not valid.")
                     return False
 
-        #
-        # Set the mode
-        #
-        self.__controller.clear_constructor()
+        self.__lights_state = True
+        plan = self.__set_verification_report(*verify_colors(self.__computer, mode, left_colors, right_colors))
+        job = self.__submit_apply(self.__set_colors, speed, plan)
 
-        for save, block in self.__computer_blocks_to_save:
+        if wait:
+            return job.wait() is True
 
-            self.__controller.add_block_line(save, block)
-            self.__controller.add_reset_line(self.__computer.reset_all_lights_on)
-            self.__controller.add_speed_line(speed)
+        return True
 
-            for region in self.__computer.get_regions():
-                for i, (left_color, right_color) in enumerate(zip(left_colors, right_colors)):
+    @pyro_server_expose
+    def modify_areaitem(self,
+                        user: str,
+                        theme_name: str,
+                        area_name: str,
+                        column: int,
+                        left_color: str,
+                        right_color: str,
+                        mode: str,
+                        wait: bool = False) -> bool:
+        """
+            Modify an AreaItem of the theme that is lit, and only write its color to the device.
+            Nothing is done if the lights are off, or if the theme is not the current one. The
+            theme file is not modified (it must be saved to be used with `set_theme`).
 
-                    if i + 1 > region._max_commands:
-                        print_warning(
-                            f"The number of maximum commands for the region={region._name} have been exceed. The loop was stopped at {i + 1}.")
-                        break
+            :param bool wait: Wait until the color is written to the device.
+        """
 
-                    if mode == 'blink':
-                        if region._can_blink:
-                            self.__controller.add_color_line(region._hex_id, 'blink', left_color, right_color)
-                        else:
-                            self.__controller.add_color_line(region._hex_id, 'fixed', left_color)
-                            print_warning(
-                                f"The mode=blink is not supported for the region={region._name}, the mode=fixed will be used instead.")
+        print_debug(f"user={user} theme_name={theme_name} area_name={area_name} column={column} "
+                    f"left_color={left_color} right_color={right_color} mode={mode}")
 
-                    elif mode == 'morph':
-                        if region._can_morph:
-                            self.__controller.add_color_line(region._hex_id, 'morph', left_color, right_color)
-                        else:
-                            self.__controller.add_color_line(region._hex_id, 'fixed', left_color)
-                            print_warning(
-                                f"The mode=morph is not supported for the region={region._name}, the mode=fixed will be used instead.")
+        if user != self.__user or not self.__lights_state or theme_name != self.__theme.get_name():
+            return False
 
-                    else:
-                        self.__controller.add_color_line(region._hex_id, 'fixed', left_color)
+        elif mode not in ('fixed', 'morph', 'blink'):
+            print_warning("Wrong mode" + str(mode))
+            return False
 
-                self.__controller.end_colors_line()
+        for color in (left_color, right_color):
+            if not string_is_hex_color(color):
+                print_warning(f"The color={color} is not valid.")
+                return False
 
-            self.__controller.end_block_line()
+        area = self.__theme.get_area_by_name(area_name)
+        if area is None or not 0 <= column < len(area.get_items()):
+            print_warning(f"The area={area_name} has no AreaItem at column={column}.")
+            return False
 
-        self.__controller.apply_config()
+        diff = {'speed': None,
+                'power_blocks': None,
+                'areas': {area_name: [(DiffOperations._modify, column, (mode, left_color, right_color))]}}
 
-        self.__lights_state = True
-        return True
+        return self.__apply_theme_diff(diff, wait)
+
+    @pyro_server_expose
+    def apply_theme_diff(self, user: str, theme_name: str, diff: dict, wait: bool = False) -> bool:
+        """
+            Apply a diff (see `Theme.diff`) to the theme that is lit. If the diff only modifies
+            AreaItems, only their colors are written to the device. Nothing is done if the lights
+            are off, or if the theme is not the current one. The theme file is not modified.
+
+            :param bool wait: Wait until the changes are written to the device.
+        """
+
+        print_debug(f"user={user} theme_name={theme_name} diff={diff}")
+
+        if user != self.__user or not self.__lights_state or theme_name != self.__theme.get_name():
+            return False
+
+        return self.__apply_theme_diff(diff, wait)
 
     """
         Bindings for the graphical interphase
@@ -359,6 +411,24 @@ class Daemon:
                 self.__computer.product_id,
                 self.__controller.get_device_information())
 
+    @pyro_server_expose
+    def get_verification_report(self) -> list[dict]:
+        """
+            Return the report of the verification of the last theme or colors request: a list of
+            dictionaries {region, slot, problem, fallback} for each color that was modified, folded or dropped.
+        """
+        return self.__verification_report
+
+    @pyro_server_expose
+    def get_commands_cache_stats(self) -> dict[str, int | float]:
+        """Return the hits, misses, hit rate and size of the cache of the compiled themes."""
+        return self.__commands_cache.get_stats()
+
+    @pyro_server_expose
+    def get_themes_cache_stats(self) -> dict[str, int | float]:
+        """Return the hits, misses, hit rate and size of the cache of the parsed themes."""
+        return self.__themes_cache.get_stats()
+
     """
         Indicator Bindings
     """
@@ -406,57 +476,405 @@ class Daemon:
         Private Methods
     """
 
-    def __illuminate_keyboard(self) -> None:
+    def __load_theme(self, theme_path: str) -> tuple[None | Theme, None | str]:
+        """
+            Return the theme and the hash of its content. If the mtime and the size of the file
+            did not change, the cached theme is returned without reading the file. Otherwise, the
+            file is only parsed if its content changed.
+        """
+
+        try:
+            stat = os.stat(theme_path)
+        except OSError:
+            print_error(format_exc())
+            return None, None
+
+        cached_theme = self.__themes_cache.get((theme_path, stat.st_mtime_ns, stat.st_size))
+        if cached_theme is not None:
+            return cached_theme
+
+        try:
+            with open(theme_path, mode='rb') as f:
+                theme_hash = hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            print_error(format_exc())
+            return None, None
+
+        # Forget the previous versions of the theme, and the commands of the ones whose content changed
+        old_entries = self.__themes_cache.remove_if(lambda key: key[0] == theme_path)
+
+        theme = None
+        old_hashes = set()
+        for old_theme, old_hash in old_entries.values():
+            if old_hash == theme_hash:
+                theme = old_theme  # Only the mtime changed
+            else:
+                old_hashes.add(old_hash)
+
+        if len(old_hashes) > 0:
+            self.__commands_cache.remove_if(lambda key: key[1] in old_hashes)
+
+        if theme is None:
+            theme = theme_factory.load_theme_from_file(self.__computer, theme_path)
+            if theme is None:
+                return None, None
+
+        self.__themes_cache.set((theme_path, stat.st_mtime_ns, stat.st_size), (theme, theme_hash))
+
+        return theme, theme_hash
+
+    def __mark_theme_as_used(self, theme: Theme, theme_hash: None | str) -> None:
+        """
+            Update the mtime of the theme file (the last modified theme is the one loaded by default),
+            and the key of the theme in the cache, so the next load does not read the file again.
+        """
+
+        path = theme.get_path()
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+
+        print_debug(f"Mark theme as last used... path={path}", direct_output=True)
+
+        old_entries = self.__themes_cache.remove_if(lambda key: key == (path, stat.st_mtime_ns, stat.st_size))
+        os.utime(path, None)
+
+        # The theme is only re-cached if the file did not change since it was loaded.
+        for cached_theme, cached_hash in old_entries.values():
+            if cached_theme is theme and cached_hash == theme_hash:
+                stat = os.stat(path)
+                self.__themes_cache.set((path, stat.st_mtime_ns, stat.st_size), (theme, theme_hash))
+
+    def __set_verification_report(self, plan: list, report: list[dict]) -> list:
+        """Store the report of a verification, and return its plan."""
+
+        self.__verification_report = report
+        if len(report) > 0:
+            print_warning("The request was adapted to the computer regions:\n" + get_report_text(report))
+
+        return plan
+
+    def __add_plan_lines(self, plan: list) -> None:
+        for colors in plan:
+            for hex_id, mode, left_color, right_color in colors:
+                self.__controller.add_color_line(hex_id, mode, left_color, right_color)
+
+            self.__controller.end_colors_line()
+
+    def __get_computer_key(self) -> None | tuple[str, int, int]:
+
+        try:
+            stat = os.stat(self.__computer.configuration_path)
+        except OSError:
+            return None
+
+        return self.__computer.configuration_path, stat.st_mtime_ns, stat.st_size
+
+    def __get_blocks_to_save(self, theme: Theme) -> tuple[tuple[bool, int], ...]:
+        """
+            Return the (save, block) to write: the boot block, and the blocks of the power
+            states of the theme. The live block (save=False) remains the last one.
+        """
+
+        power_blocks = self.__computer.get_power_blocks()
+
+        return self.__computer_blocks_to_save[:1] + \
+            tuple((True, power_blocks[name]) for name in theme.get_power_blocks()) + \
+            self.__computer_blocks_to_save[1:]
+
+    def __submit_apply(self, function: Callable, *args) -> Job:
+        """Submit a job that writes all the blocks (see `__patch_theme()`)."""
+
+        self.__submitted_applies += 1
+        return self.__worker.submit(self.__execute_apply, self.__submitted_applies, function, *args)
+
+    def __execute_apply(self, apply_number: int, function: Callable, *args) -> bool:
+        """Executed by the worker thread."""
+
+        self.__executed_apply = apply_number
+        return function(*args)
+
+    def __illuminate_keyboard(self, theme: Theme, plan: list, theme_hash: None | str = None) -> bool:
+        """
+            Executed by the worker thread. The plan is the verified colors of the theme.
+            If the hash of the theme content is provided, the commands of its blocks
+            are taken from (or added to) the cache.
+
+            The saved blocks only differ by the block of their `save_next` commands, so the
+            first one is compiled, and the power blocks are stamped from it.
+        """
 
         print_debug()
 
+        computer_key = self.__get_computer_key()
+        if computer_key != self.__computer_key:
+            print_debug("The computer configuration changed, clearing the commands cache.", direct_output=True)
+            self.__commands_cache.clear()
+            self.__computer_key = computer_key
+
         # Illuminate the computer lights
         #
         print_debug("Preparing the controller...", direct_output=True)
 
         self.__controller.clear_constructor()
-        for save, block in self.__computer_blocks_to_save:
+        saved_commands = None
+        for save, block in self.__get_blocks_to_save(theme):
 
             self.__controller.add_block_line(save=save, block=block)
             self.__controller.add_reset_line(self.__computer.reset_all_lights_on)
-            self.__controller.add_speed_line(self.__theme.get_speed())
 
-            for area in self.__theme.get_areas():
-                for areaitem in area.get_items():
-                    self.__controller.add_color_line(areaitem.get_hex_id(),
-                                                     areaitem.get_mode(),
-                                                     areaitem.get_left_color(),
-                                                     areaitem.get_right_color())
+            if save and saved_commands is not None:
+                self.__controller.add_commands(saved_commands, block)
+                continue
 
-                self.__controller.end_colors_line()
+            commands = None
+            cache_key = None if theme_hash is None else (computer_key, theme_hash, block, save)
+            if cache_key is not None:
+                commands = self.__commands_cache.get(cache_key)
 
-            self.__controller.end_block_line()
+            if commands is None:
+                self.__controller.add_speed_line(theme.get_speed())
+                self.__add_plan_lines(plan)
+                self.__controller.end_block_line()
+
+                if cache_key is not None or save:
+                    commands = self.__controller.get_last_block_commands()
+
+                if cache_key is not None:
+                    self.__commands_cache.set(cache_key, commands)
+            else:
+                self.__controller.add_commands(commands)
+
+            if save:
+                saved_commands = commands
 
         print_debug("Applying constructor...", direct_output=True)
-        self.__controller.apply_config()
+        status = self.__controller.apply_config()
+
+        if status == PollStatus._ready:
+            self.__areaitems_index = self.__get_areaitems_index(theme, plan)
+        else:
+            self.__areaitems_index = {}
+
+        self.__lit_theme = theme
 
         #
         # Mark the current theme as "last used"
         #
-        if os.path.exists(self.__theme.get_path()):
-            print_debug(f"Mark theme as last used... path={self.__theme.get_path()}", direct_output=True)
-            os.utime(self.__theme.get_path(), None)
+        self.__mark_theme_as_used(theme, theme_hash)
 
         # Update the Indicator
         #
         if self.__pyro_indicator is not None:
-            print_debug(f"Sending update to the indicator... theme_name={self.__theme.get_name()} state={self.__lights_state}",
+            print_debug(f"Sending update to the indicator... theme_name={theme.get_name()} state={self.__lights_state}",
                         direct_output=True)
             self.__indicator_send_code(IndicatorCodes._lights_on)
             try:
-                self.__pyro_indicator.load_themes(self.__theme.get_name(),
+                self.__pyro_indicator.load_themes(theme.get_name(),
                                                   self.__lights_state)
             except Exception:
                 print_error(format_exc())
 
-        # Update the Daemon variables
-        #
-        self.__lights_state = True
+        return status == PollStatus._ready
+
+    def __get_areaitems_index(self, theme: Theme, plan: list) -> dict[tuple[str, int], tuple[int, int]]:
+        """
+            Return the (loop index, slot) of each AreaItem in the committed live block. The loops of the
+            block are found by the regions of their colors, since the Controller coalesces the areas that
+            have the same colors (see `Engine.Operations.merge_loops`).
+
+            Only the loops of a single area, with one color per AreaItem, are listed. The AreaItems of the
+            coalesced loops, and of the loops that the verification folded or truncated, can not be patched.
+        """
+
+        block = self.__computer_blocks_to_save[-1][1]
+
+        loop_indexes = {}
+        for loop_index, loop_regions in enumerate(self.__controller.get_committed_loops_regions(block)):
+            loop_indexes.setdefault(loop_regions, loop_index)
+
+        index = {}
+        for area, colors in zip(theme.get_areas(), plan):
+            if len(colors) == 0 or len(colors) != len(area.get_items()):
+                continue
+
+            loop_index = loop_indexes.get(tuple(color[0] for color in colors))
+            if loop_index is None:
+                continue
+
+            for column in range(len(colors)):
+                index[(area._name, column)] = (loop_index, column)
+
+        return index
+
+    def __apply_theme_diff(self, diff: dict, wait: bool) -> bool:
+
+        try:
+            if diff_is_empty(diff):
+                return True
+        except (TypeError, KeyError):
+            print_warning(f"Wrong diff={diff}")
+            return False
+
+        # The themes can be shared with the cache and the worker, so they are never modified.
+        theme = theme_factory.copy_theme(self.__theme, self.__theme.get_path())
+
+        try:
+            patch_theme(theme, diff)
+        except (ValueError, TypeError, KeyError):
+            print_warning(f"The diff could not be applied:\n{format_exc()}")
+            return False
+
+        self.__theme = theme
+        self.__theme_hash = None  # The theme does not match its file anymore
+        plan = self.__set_verification_report(*verify_theme(self.__computer, theme))
+        job = self.__worker.submit(self.__patch_theme, theme, plan, self.__submitted_applies)
+
+        if wait:
+            return job.wait() is True
+
+        return True
+
+    def __patch_theme(self, theme: Theme, plan: list, apply_number: int) -> bool:
+        """
+            Executed by the worker thread. The diff between the lit theme and the theme is computed here,
+            so it contains the changes of the patches that were superseded. If it only modifies AreaItems
+            of the index, only their loops are written, otherwise the theme is illuminated (only the loops
+            that changed are uploaded). The theme is also illuminated if an apply was superseded, or if
+            the length of a patched loop changed.
+        """
+
+        if apply_number != self.__executed_apply:
+            print_debug("An apply was superseded, illuminating the theme.")
+            return self.__illuminate_keyboard(theme, plan)
+
+        elif self.__areaitems_index is None:
+            print_debug("The theme is not lit, nothing to patch.")
+            return False
+
+        diff = diff_themes(self.__lit_theme, theme)
+        if diff_is_empty(diff):
+            return True
+
+        plan_indexes = {area._name: plan_index for plan_index, area in enumerate(theme.get_areas())}
+        loops_lengths = self.__controller.get_committed_loops_lengths(self.__computer_blocks_to_save[-1][1])
+
+        patches = []  # (plan index, column, loop index, slot)
+        if diff['speed'] is None and diff['power_blocks'] is None:
+            for area_name, operations in diff['areas'].items():
+                plan_index = plan_indexes.get(area_name)
+
+                for operation, column, _ in operations:
+                    index = self.__areaitems_index.get((area_name, column))
+
+                    # The verification could fold the new colors of the area to another length.
+                    if operation != DiffOperations._modify or index is None or plan_index is None or \
+                            len(plan[plan_index]) != loops_lengths[index[0]]:
+                        patches = None
+                        break
+
+                    patches.append((plan_index, column) + index)
+
+                if patches is None:
+                    break
+
+        if not patches:
+            print_debug("The diff can not be patched, illuminating the theme.")
+            return self.__illuminate_keyboard(theme, plan)
+
+        for plan_index, column, loop_index, slot in patches:
+            _, mode, left_color, right_color = plan[plan_index][column]
+
+            status = self.__controller.patch_color(self.__computer_blocks_to_save[-1][1],
+                                                   loop_index,
+                                                   slot,
+                                                   mode,
+                                                   left_color,
+                                                   right_color)
+            if status is None:
+                return self.__illuminate_keyboard(theme, plan)
+
+            elif status != PollStatus._ready:
+                self.__areaitems_index = {}
+                return False
+
+        self.__lit_theme = theme
+
+        return True
+
+    def __turn_off_lights(self, theme: Theme, areas_to_keep_on: str) -> bool:
+        """Executed by the worker thread."""
+
+        self.__areaitems_index = None
+        self.__lit_theme = None
+
+        if areas_to_keep_on == '':
+
+            self.__controller.clear_constructor()
+
+            for save, block in self.__get_blocks_to_save(theme):
+                self.__controller.add_block_line(save, block)
+                self.__controller.add_reset_line(self.__computer.reset_all_lights_off)
+
+            status = self.__controller.apply_config()
+        else:
+            #
+            # To turn off the lights but let some areas on, instead of sending
+            # the command "all the lights off", some areas are set to black color.
+            #
+
+            areas_to_keep_on = areas_to_keep_on.split('|')
+
+            self.__controller.clear_constructor()
+            saved_commands = None
+            for save, block in self.__get_blocks_to_save(theme):
+
+                self.__controller.add_block_line(save, block)
+                self.__controller.add_reset_line(self.__computer.reset_all_lights_on)
+
+                if save and saved_commands is not None:
+                    self.__controller.add_commands(saved_commands, block)
+                    continue
+
+                self.__controller.add_speed_line(1)
+
+                for area in theme.get_areas():
+                    if area._name not in areas_to_keep_on:
+                        for areaitem in area.get_items():
+                            self.__controller.add_color_line(areaitem.get_hex_id(), 'fixed', '#000000', '#000000')
+                        self.__controller.end_colors_line()
+                self.__controller.end_block_line()
+
+                if save:
+                    saved_commands = self.__controller.get_last_block_commands()
+
+            status = self.__controller.apply_config()
+
+        self.__indicator_send_code(IndicatorCodes._lights_off)
+
+        return status == PollStatus._ready
+
+    def __set_colors(self, speed: int, plan: list) -> bool:
+        """Executed by the worker thread. The plan is the verified colors of each region."""
+
+        self.__areaitems_index = None
+        self.__lit_theme = None
+
+        self.__controller.clear_constructor()
+
+        for save, block in self.__computer_blocks_to_save:
+
+            self.__controller.add_block_line(save, block)
+            self.__controller.add_reset_line(self.__computer.reset_all_lights_on)
+            self.__controller.add_speed_line(speed)
+            self.__add_plan_lines(plan)
+            self.__controller.end_block_line()
+
+        status = self.__controller.apply_config()
+
+        return status == PollStatus._ready
 
     def __indicator_send_code(self, code: int) -> None:
 
@@ -469,10 +887,10 @@ class Daemon:
                 print_error(format_exc())
 
 
-def main(fake=False):
+def main(fake=False, backend='pyusb'):
     os.chdir(os.path.dirname(os.path.realpath(__file__)))  # todo: why is this necessary?
 
-    akbl_daemon = Daemon(fake=fake)
+    akbl_daemon = Daemon(fake=fake, backend=backend)
     pyro_daemon = PyroServerDaemon()
     pyro_uri = str(pyro_daemon.register(akbl_daemon))
     pyro_uri_file = Paths()._daemon_pyro_file
@@ -490,4 +908,5 @@ if __name__ == "__main__":
         print("Error: The Daemon is already running.")
         sys.exit(1)
 
-    main(fake="--fake" in sys.argv)
+    main(fake="--fake" in sys.argv,
+         backend='libusb' if "--libusb" in sys.argv else 'pyusb')
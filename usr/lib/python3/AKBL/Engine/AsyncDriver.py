@@ -0,0 +1,355 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""
+    Driver backend using the asynchronous transfers of libusb-1.0 (through ctypes),
+    so several control transfers can be in flight at the same time. It has the same
+    interface as Engine.Driver.Driver, but it does not depend on pyusb.
+"""
+
+import ctypes
+from traceback import format_exc
+
+from Paths import Paths
+from Engine import Constructor
+from Engine.FakeLibUSB import FakeLibUSB
+from console_printer import print_debug, print_error, is_debug_enabled
+
+_LIBUSB_SUCCESS = 0
+_LIBUSB_TRANSFER_COMPLETED = 0
+_LIBUSB_TRANSFER_TYPE_CONTROL = 0
+_LIBUSB_CONTROL_SETUP_SIZE = 8
+_LIBUSB_MAX_CONTROL_DATA = 64
+
+
+class LibUSBTransfer(ctypes.Structure):
+    pass
+
+
+LIBUSB_TRANSFER_CALLBACK = ctypes.CFUNCTYPE(None, ctypes.POINTER(LibUSBTransfer))
+
+LibUSBTransfer._fields_ = [('dev_handle', ctypes.c_void_p),
+                           ('flags', ctypes.c_uint8),
+                           ('endpoint', ctypes.c_ubyte),
+                           ('type', ctypes.c_ubyte),
+                           ('timeout', ctypes.c_uint),
+                           ('status', ctypes.c_int),
+                           ('length', ctypes.c_int),
+                           ('actual_length', ctypes.c_int),
+                           ('callback', LIBUSB_TRANSFER_CALLBACK),
+                           ('user_data', ctypes.c_void_p),
+                           ('buffer', ctypes.POINTER(ctypes.c_ubyte)),
+                           ('num_iso_packets', ctypes.c_int)]
+
+
+class TimeVal(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long),
+                ('tv_usec', ctypes.c_long)]
+
+
+def _load_libusb(path: str) -> ctypes.CDLL:
+    libusb = ctypes.CDLL(path)
+
+    prototypes = (
+        ('libusb_init', ctypes.c_int, (ctypes.POINTER(ctypes.c_void_p),)),
+        ('libusb_exit', None, (ctypes.c_void_p,)),
+        ('libusb_open_device_with_vid_pid', ctypes.c_void_p, (ctypes.c_void_p, ctypes.c_uint16, ctypes.c_uint16)),
+        ('libusb_close', None, (ctypes.c_void_p,)),
+        ('libusb_set_configuration', ctypes.c_int, (ctypes.c_void_p, ctypes.c_int)),
+        ('libusb_detach_kernel_driver', ctypes.c_int, (ctypes.c_void_p, ctypes.c_int)),
+        ('libusb_claim_interface', ctypes.c_int, (ctypes.c_void_p, ctypes.c_int)),
+        ('libusb_control_transfer', ctypes.c_int, (ctypes.c_void_p, ctypes.c_uint8, ctypes.c_uint8, ctypes.c_uint16,
+                                                   ctypes.c_uint16, ctypes.POINTER(ctypes.c_ubyte), ctypes.c_uint16,
+                                                   ctypes.c_uint)),
+        ('libusb_alloc_transfer', ctypes.POINTER(LibUSBTransfer), (ctypes.c_int,)),
+        ('libusb_free_transfer', None, (ctypes.POINTER(LibUSBTransfer),)),
+        ('libusb_submit_transfer', ctypes.c_int, (ctypes.POINTER(LibUSBTransfer),)),
+        ('libusb_handle_events_timeout_completed', ctypes.c_int, (ctypes.c_void_p, ctypes.POINTER(TimeVal),
+                                                                  ctypes.POINTER(ctypes.c_int))))
+
+    for name, restype, argtypes in prototypes:
+        function = getattr(libusb, name)
+        function.restype = restype
+        function.argtypes = argtypes
+
+    return libusb
+
+
+class AsyncDriver:
+
+    def __init__(self,
+                 fake: bool = False,
+                 max_transfers: int = 8,
+                 timeout: int = 1000):
+        """
+            :param int max_transfers: Maximum number of transfers in flight.
+            :param int timeout: Timeout of each transfer, in milliseconds.
+        """
+
+        self.__fake = fake
+        self.__timeout = timeout
+
+        self.__libusb = None
+        self.__context = ctypes.c_void_p()
+        self.__device_handle = None
+        self.__device_ids = (None, None)
+
+        self.__owns_interface = False
+        self.__handshakes_count = 0
+
+        # Pool of transfers, each one with its own buffer (setup packet + data).
+        self.__transfers = []
+        self.__buffers = []
+        self.__max_transfers = max_transfers
+        self.__free_transfers = []
+        self.__pending_transfers = 0
+        self.__failed_transfers = 0
+        self.__callback = LIBUSB_TRANSFER_CALLBACK(self.__on_transfer_completed)
+        self.__event_timeout = TimeVal(timeout // 1000, (timeout % 1000) * 1000)
+
+        # Define I/O Request types
+        self.__send_request_type = 33
+        self.__send_request = 9
+        self.__send_value = 514
+        self.__send_index = 0
+        self.__read_request_type = 161
+        self.__read_request = 1
+        self.__read_value = 257
+        self.__read_index = 0
+
+    def load_device(self, id_vendor: int, id_product: int) -> None:
+
+        print_debug(f"id_vendor={id_vendor}, id_product={id_product}")
+
+        self.__close()
+
+        try:
+            if self.__fake:
+                print_debug('faking libusb...', direct_output=True)
+                self.__libusb = FakeLibUSB(LibUSBTransfer)
+            else:
+                self.__libusb = _load_libusb(Paths()._libusb_file)
+
+            if self.__libusb.libusb_init(ctypes.byref(self.__context)) != _LIBUSB_SUCCESS:
+                print_error("libusb could not be initialized.")
+                self.__libusb = None
+                return
+
+            self.__device_handle = self.__libusb.libusb_open_device_with_vid_pid(self.__context, id_vendor, id_product)
+
+        except Exception:
+            self.__device_handle = None
+            print_error(format_exc())
+
+        print_debug(f'device_handle={self.__device_handle}', direct_output=True)
+
+        if self.__device_handle is not None:
+            self.__device_ids = (id_vendor, id_product)
+            self.__allocate_transfers()
+            self.take_over()
+
+    def has_device(self) -> bool:
+        return self.__device_handle is not None
+
+    def get_handshakes_count(self) -> int:
+        """Return the number of times that the USB configuration was set (see `take_over()`)."""
+        return self.__handshakes_count
+
+    def device_information(self) -> str:
+        if self.__device_handle is None:
+            return ""
+
+        return "libusb device: id_vendor={}, id_product={}".format(*self.__device_ids)
+
+    def write_constructor(self, constructor: Constructor) -> bool:
+
+        if is_debug_enabled():
+            print_debug(constructor.get_debug_text())
+
+        return self.write_commands(constructor)
+
+    def write_commands(self, commands) -> bool:
+        """
+            Submit the commands as asynchronous control transfers, with up to `max_transfers`
+            in flight, and return once all of them are completed. The control transfers of an
+            endpoint are executed in order, so the order of the commands is kept.
+        """
+
+        if self.__device_handle is None:
+            return False
+
+        self.__failed_transfers = 0
+
+        try:
+            for command in commands:
+                while len(self.__free_transfers) == 0:
+                    self.__handle_events()
+
+                index = self.__free_transfers.pop()
+                self.__fill_transfer(index, command)
+
+                if self.__libusb.libusb_submit_transfer(self.__transfers[index]) != _LIBUSB_SUCCESS:
+                    self.__free_transfers.append(index)
+                    self.__failed_transfers += 1
+                    break
+
+                self.__pending_transfers += 1
+
+            while self.__pending_transfers > 0:
+                self.__handle_events()
+
+        except Exception:
+            self.__owns_interface = False
+            print_error(format_exc())
+            return False
+
+        if self.__failed_transfers > 0:
+            self.__owns_interface = False
+            print_error(f"{self.__failed_transfers} transfers failed.")
+            return False
+
+        return True
+
+    def read_device(self, constructor: Constructor) -> None | list[int]:
+
+        if is_debug_enabled():
+            print_debug(str(constructor))
+
+        length = len(constructor.get_first_command())
+        data = (ctypes.c_ubyte * length)()
+
+        try:
+            read_length = self.__libusb.libusb_control_transfer(self.__device_handle,
+                                                                self.__read_request_type,
+                                                                self.__read_request,
+                                                                self.__read_value,
+                                                                self.__read_index,
+                                                                data,
+                                                                length,
+                                                                self.__timeout)
+        except Exception:
+            read_length = -1
+            print_error(format_exc())
+
+        if read_length < 0:
+            self.__owns_interface = False
+            print_error(f"libusb_control_transfer error={read_length}")
+            return None
+
+        msg = list(data[:read_length])
+
+        if not self.__fake and is_debug_enabled():
+            print_debug(f"msg={msg}")
+
+        return msg
+
+    def take_over(self) -> None:
+
+        if self.__owns_interface or self.__device_handle is None:
+            return
+
+        print_debug()
+
+        self.__handshakes_count += 1
+
+        if self.__libusb.libusb_set_configuration(self.__device_handle, 1) != _LIBUSB_SUCCESS:
+            self.__libusb.libusb_detach_kernel_driver(self.__device_handle, 0)
+            if self.__libusb.libusb_set_configuration(self.__device_handle, 1) != _LIBUSB_SUCCESS:
+                print_error("The USB configuration could not be set.")
+                return
+
+        if self.__libusb.libusb_claim_interface(self.__device_handle, 0) != _LIBUSB_SUCCESS:
+            print_error("The USB interface could not be claimed.")
+            return
+
+        self.__owns_interface = True
+
+    def __allocate_transfers(self) -> None:
+
+        for _ in range(self.__max_transfers):
+            transfer = self.__libusb.libusb_alloc_transfer(0)
+            buffer = (ctypes.c_ubyte * (_LIBUSB_CONTROL_SETUP_SIZE + _LIBUSB_MAX_CONTROL_DATA))()
+
+            self.__transfers.append(transfer)
+            self.__buffers.append(memoryview(buffer).cast('B'))
+
+            # Values that do not change between transfers
+            #
+            contents = transfer.contents
+            contents.dev_handle = self.__device_handle
+            contents.endpoint = 0
+            contents.type = _LIBUSB_TRANSFER_TYPE_CONTROL
+            contents.timeout = self.__timeout
+            contents.callback = self.__callback
+            contents.user_data = len(self.__transfers) - 1
+            contents.buffer = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_ubyte))
+
+            # Setup packet (libusb_fill_control_setup), only the length (bytes 6-7) changes.
+            #
+            buffer[0] = self.__send_request_type
+            buffer[1] = self.__send_request
+            buffer[2:4] = self.__send_value.to_bytes(2, 'little')
+            buffer[4:6] = self.__send_index.to_bytes(2, 'little')
+
+        self.__free_transfers = list(range(len(self.__transfers)))
+
+    def __fill_transfer(self, index: int, command) -> None:
+        length = len(command)
+        buffer = self.__buffers[index]
+        buffer[6] = length & 0xff
+        buffer[7] = length >> 8
+        buffer[_LIBUSB_CONTROL_SETUP_SIZE:_LIBUSB_CONTROL_SETUP_SIZE + length] = command
+        self.__transfers[index].contents.length = _LIBUSB_CONTROL_SETUP_SIZE + length
+
+    def __handle_events(self) -> None:
+        self.__libusb.libusb_handle_events_timeout_completed(self.__context,
+                                                             ctypes.byref(self.__event_timeout),
+                                                             None)
+
+    def __on_transfer_completed(self, transfer_pointer) -> None:
+        transfer = transfer_pointer.contents
+
+        if transfer.status != _LIBUSB_TRANSFER_COMPLETED:
+            self.__failed_transfers += 1
+            if is_debug_enabled():
+                print_debug(f"transfer status={transfer.status}")
+
+        self.__pending_transfers -= 1
+        self.__free_transfers.append(transfer.user_data or 0)  # ctypes returns None for a NULL pointer
+
+    def __close(self) -> None:
+
+        self.__owns_interface = False
+
+        if self.__libusb is None:
+            return
+
+        for transfer in self.__transfers:
+            self.__libusb.libusb_free_transfer(transfer)
+
+        self.__transfers.clear()
+        self.__buffers.clear()
+        self.__free_transfers.clear()
+        self.__pending_transfers = 0
+
+        if self.__device_handle is not None:
+            self.__libusb.libusb_close(self.__device_handle)
+            self.__device_handle = None
+
+        self.__libusb.libusb_exit(self.__context)
+        self.__libusb = None
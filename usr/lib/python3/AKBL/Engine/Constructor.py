@@ -17,24 +17,101 @@
 #   along with this program; if not, write to the Free Software Foundation,
 #   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-from utils import rgb_to_hex
-from console_printer import print_warning
+from difflib import unified_diff
+from functools import lru_cache
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from console_printer import print_warning, is_debug_enabled
 from Computer import Computer
-from Engine.Command import Command
+from Engine.Operations import OperationCodes, get_operation_text, optimize, validate_slots
+
+_INITIAL_CAPACITY = 64  # Number of commands pre-allocated in the arena.
+_COLORS_CACHE_SIZE = 1024  # Number of hex colors whose parsing is remembered.
+
+#
+# The hardware uses 4 bits per channel, so the colors are encoded from their RGB444
+# value (0xRGB). These tables return the bytes of a left or right color, by RGB444 value.
+#
+_LEFT_COLOR_BYTES = tuple(((rgb444 >> 8) * 16 + (rgb444 >> 4 & 0xF), (rgb444 & 0xF) * 16) for rgb444 in range(4096))
+_RIGHT_COLOR_BYTES = tuple((rgb444 >> 8, (rgb444 >> 4 & 0xF) * 16 + (rgb444 & 0xF)) for rgb444 in range(4096))
+
+
+@lru_cache(maxsize=_COLORS_CACHE_SIZE)
+def _hex_to_rgb444(color: str) -> int:
+    """Parse a hex color (#RRGGBB) to its RGB444 value."""
+
+    if len(color) == 7 and color[0] == '#':
+        value = int(color[1:], 16)
+        return (value >> 12 & 0xF00) | (value >> 8 & 0xF0) | (value >> 4 & 0xF)
+
+    color = color.replace("#", '')
+
+    return (int(color[0:2], 16) // 16) << 8 | (int(color[2:4], 16) // 16) << 4 | int(color[4:6], 16) // 16
+
+
+def _to_rgb444(color: list[int] | str) -> int:
+
+    if isinstance(color, list):
+        return (int(color[0]) // 16) << 8 | (int(color[1]) // 16) << 4 | int(color[2]) // 16
+
+    return _hex_to_rgb444(color)
 
 
 class Constructor:
+    """
+        The Constructor works in two phases:
+
+            1. Its methods record typed operations (see `Engine.Operations`).
+            2. When the commands are requested, the optimization passes run over the operations
+               and they are lowered to commands.
+
+        The commands are written into a single contiguous bytearray (the arena), in which each
+        command is a record of `computer.data_length` bytes. Iterating the constructor yields
+        memoryview slices of the arena, so the commands can be sent without creating intermediate lists.
+
+        The passes never move an operation to another block, so only the blocks that were not
+        lowered yet (or the last one, which may still be modified) are lowered again.
+    """
 
     def __init__(self,
                  computer: Computer,
                  save: bool = False,
-                 block: int = 1) -> None:
+                 block: int = 1,
+                 coalesce_regions: bool = False) -> None:
+        """
+            :param bool coalesce_regions:
+                Merge the loops that set the same colors into one loop for all their
+                regions (the `hex_id` of the regions are bit masks).
+        """
 
         self.__computer = computer
-        self.__commands = []
         self.__block = block
         self.__hex_id = 1
         self.__save = save
+        self.__initial_state = (save, block)
+        self.__coalesce_regions = coalesce_regions
+
+        self.__operations = []
+
+        # The operations [0, lowered_operations) are lowered into the commands [0, lowered_count),
+        # the operation `lowered_operations` starts the last block (or it is the first operation).
+        self.__lowered_operations = 0
+        self.__lowered_count = 0
+        self.__lowered = True
+        self.__loop_hex_id = 1
+
+        self.__data_length = computer.data_length
+        self.__empty_command = bytes([computer.fill_byte]) * self.__data_length
+        self.__arena = bytearray(self.__empty_command * _INITIAL_CAPACITY)
+        self.__count = 0
+
+        # The legends are only generated when debugging.
+        self.__verbose = is_debug_enabled()
+        self.__legends = []
 
     def __str__(self) -> str:
         return "Constructor: computer.name={}, hex_id={}, block={}, _save={}".format(self.__computer.name,
@@ -43,57 +120,150 @@ class Constructor:
                                                                                      self.__save)
 
     def __iter__(self):
-        for command in self.__commands:
-            yield command
+        self.__lower()
+        view = memoryview(self.__arena)
+        length = self.__data_length
+        for offset in range(0, self.__count * length, length):
+            yield view[offset:offset + length]
+
+    def __len__(self) -> int:
+        self.__lower()
+        return self.__count
 
     def clear(self) -> None:
-        self.__commands.clear()
+        """The arena remains allocated, only the operations and the commands are discarded."""
+        self.__operations.clear()
+        self.__lowered_operations = 0
+        self.__lowered_count = 0
+        self.__lowered = True
+        self.__count = 0
+        self.__legends.clear()
+        self.__save, self.__block = self.__initial_state
         self.__hex_id = 1
 
-    def get_first_command(self) -> None | int:
+    def get_operations(self, optimized: bool = True) -> list[tuple]:
+        if optimized:
+            return optimize(self.__operations, self.__coalesce_regions)
+
+        return list(self.__operations)
+
+    def get_first_command(self) -> None | memoryview:
 
-        if len(self.__commands) > 0:
-            return self.__commands[0]
+        self.__lower()
+        if self.__count > 0:
+            return memoryview(self.__arena)[:self.__data_length]
 
         return None
 
-    def add_light_areaitem(self, area_hex_id: int, color: list[int] | str) -> None:
-        legend = '''add_light_areaitem: left_color={}, hex_id={}'''.format(color, area_hex_id)
+    def get_commands_view(self, start: int = 0, end: None | int = None) -> memoryview:
+        """Return a view of the commands [start, end) of the arena."""
+
+        self.__lower()
+        if end is None:
+            end = self.__count
+
+        return memoryview(self.__arena)[start * self.__data_length:end * self.__data_length]
+
+    def get_debug_text(self) -> str:
+        """Return the differences made by the optimization passes, followed by the commands."""
+
+        if not self.__verbose:
+            return ""
 
-        self.__save_line()
-        self.__add_item(area_hex_id=area_hex_id,
-                        left_color=color,
-                        right_color=None,
-                        legend=legend,
-                        cmd_color_type=self.__computer.command_set_color)
+        self.__lower()
+
+        operations_diff = unified_diff([get_operation_text(operation, self.__computer)
+                                        for operation in self.get_operations(optimized=False)],
+                                       [get_operation_text(operation, self.__computer)
+                                        for operation in self.get_operations(optimized=True)],
+                                       'operations', 'optimized operations', lineterm='')
+
+        commands = (f"[{','.join(str(item) for item in command)}] \t {legend}"
+                    for command, legend in zip(self, self.__legends))
+
+        return '\n'.join(operations_diff) + '\n\n' + '\n'.join(commands)
+
+    def add_light_areaitem(self, area_hex_id: int, color: list[int] | str) -> None:
+        self.__add_operation((OperationCodes._color,
+                              self.__computer.command_set_color,
+                              area_hex_id,
+                              _to_rgb444(color),
+                              None))
 
     def add_blink_areaitem(self, area_hex_id: int, color: list[int] | str) -> None:
-        legend = "add_blink_areaitem:color={}, hex_id={}".format(color, area_hex_id)
-        self.__add_item(area_hex_id=area_hex_id,
-                        left_color=color,
-                        right_color=None,
-                        legend=legend,
-                        cmd_color_type=self.__computer.command_set_blink_color)
+        self.__add_operation((OperationCodes._color,
+                              self.__computer.command_set_blink_color,
+                              area_hex_id,
+                              _to_rgb444(color),
+                              None))
 
     def add_morph_areaitem(self,
                            area_hex_id: int,
                            left_color: list[int] | str,
                            right_color: list[int] | str) -> None:
 
-        legend = '''add_morph_areaitem: left_color={}, right_color={}, hex_id={}'''.format(left_color,
-                                                                                           right_color,
-                                                                                           area_hex_id)
+        self.__add_operation((OperationCodes._color,
+                              self.__computer.command_set_morph_color,
+                              area_hex_id,
+                              _to_rgb444(left_color),
+                              _to_rgb444(right_color)))
+
+    def add_frame(self,
+                  region_hex_ids,
+                  modes,
+                  left_colors,
+                  right_colors=None) -> None:
+        """
+            Add a frame of N regions with K color slots: one loop of K colors for each region,
+            as if each color was added with `add_*_areaitem` followed by `set_end_colors_line`.
+
+            :param region_hex_ids: (N,) hex_ids (bit masks) of the regions.
+            :param modes: (N, K) color commands of the computer (`command_set_color`,
+                          `command_set_blink_color` or `command_set_morph_color`).
+            :param left_colors: (N, K, 3) RGB values (uint8).
+            :param right_colors: (N, K, 3) RGB values (uint8), only used by the morph colors.
+
+            When numpy is installed the frame is lowered with array operations (the loops of
+            the frame are not optimized), otherwise the items are added one by one.
+        """
+
+        if numpy is None or (right_colors is None and self.__computer.command_set_morph_color in numpy.asarray(modes)):
+            self.__add_frame_items(region_hex_ids, modes, left_colors, right_colors)
+            return
 
-        self.__add_item(area_hex_id=area_hex_id,
-                        left_color=left_color,
-                        right_color=right_color,
-                        legend=legend,
-                        cmd_color_type=self.__computer.command_set_morph_color)
+        modes = numpy.asarray(modes, dtype=numpy.uint8)
+        left_colors = numpy.asarray(left_colors, dtype=numpy.uint8)
+        right_colors = left_colors if right_colors is None else numpy.asarray(right_colors, dtype=numpy.uint8)
+
+        self.__add_operation((OperationCodes._frame,
+                              numpy.asarray(region_hex_ids, dtype=numpy.uint32),
+                              modes,
+                              left_colors,
+                              right_colors))
+
+        self.__hex_id += len(modes)
+
+    def add_commands(self, commands: bytes, block: None | int = None) -> None:
+        """
+            Add commands that were already encoded (a multiple of `data_length` bytes).
+
+            :param None|int block: If provided, the `save_next` commands are stamped with this block,
+                                   so the commands of a saved block can be written to another block.
+        """
+
+        if block is not None:
+            commands = bytearray(commands)
+            for offset in range(0, len(commands) - self.__data_length + 1, self.__data_length):
+                if commands[offset + 1] == self.__computer.command_save_next:
+                    commands[offset + 2] = block
+
+        self.__add_operation((OperationCodes._commands, bytes(commands)))
 
     def set_block(self, save: bool, block: int) -> None:
         self.__save = save
         self.__block = block
         self.__hex_id = 1
+        self.__add_operation((OperationCodes._block, save, block))
 
     def set_speed(self, speed: int) -> None:
 
@@ -106,187 +276,275 @@ class Constructor:
             speed = 0
             print_warning("The speed can not be < 0, it will be set equal to 0.")
 
-        self.__save_line()
+        self.__add_operation((OperationCodes._speed, speed))
 
-        legend = "set_speed, speed={}\n".format(speed)
+    def set_get_status(self) -> None:
+        self.__add_operation((OperationCodes._status,))
 
-        cmd = self.__get_cmd()
-        cmd[0] = self.__computer.start_byte
-        cmd[1] = self.__computer.command_set_speed
-        cmd[3] = speed
+    def set_reset_area(self, computer_command=None) -> None:
 
-        self.__commands.append(Command(legend, cmd))
+        if computer_command is None:
+            computer_command = self.__computer.reset_all_lights_on
 
-    def set_get_status(self) -> None:
+        elif computer_command not in (self.__computer.reset_all_lights_on,
+                                      self.__computer.reset_all_lights_off,
+                                      self.__computer.reset_touch_controls):
+            print_warning("Wrong command={}".format(computer_command))
 
-        legend = "set_get_status"
+        self.__add_operation((OperationCodes._reset, computer_command))
 
-        cmd = self.__get_cmd()
-        cmd[0] = self.__computer.start_byte
-        cmd[1] = self.__computer.command_get_status
+    def set_end_colors_line(self) -> None:
+        self.__add_operation((OperationCodes._loop_end,))
+        self.__hex_id += 1
 
-        self.__commands.append(Command(legend, cmd))
+    def set_end_block_line(self) -> None:
+        self.__add_operation((OperationCodes._transmit,))
 
-    def set_reset_area(self, computer_command=None) -> None:
+    def __add_operation(self, operation: tuple) -> None:
+        self.__operations.append(operation)
+        self.__lowered = False
 
-        match computer_command:
-            case None | self.__computer.reset_all_lights_on:
-                computer_command = self.__computer.reset_all_lights_on
-                legend = "reset, command=RESET_ALL_LIGHTS_ON\n"
+    def __add_frame_items(self, region_hex_ids, modes, left_colors, right_colors) -> None:
 
-            case self.__computer.reset_all_lights_off:
-                legend = "reset, command=RESET_ALL_LIGHTS_OFF\n"
+        computer = self.__computer
 
-            case self.__computer.reset_touch_controls:
-                legend = "reset, command=RESET_TOUCH_CONTROLS\n"
+        for i, region_hex_id in enumerate(region_hex_ids):
+            region_hex_id = int(region_hex_id)
 
-            case _:
-                legend = "reset, command=UNKNOWN COMMAND !!\n"
-                print_warning("Wrong command={}".format(computer_command))
+            for j, mode in enumerate(modes[i]):
+                left_color = [int(value) for value in left_colors[i][j]]
 
-        self.__save_line()
+                if mode == computer.command_set_color:
+                    self.add_light_areaitem(region_hex_id, left_color)
 
-        cmd = self.__get_cmd()
-        cmd[0] = self.__computer.start_byte
-        cmd[1] = self.__computer.command_reset
-        cmd[2] = computer_command
+                elif mode == computer.command_set_blink_color:
+                    self.add_blink_areaitem(region_hex_id, left_color)
 
-        self.__commands.append(Command(legend, cmd))
+                elif mode == computer.command_set_morph_color and right_colors is not None:
+                    self.add_morph_areaitem(region_hex_id,
+                                            left_color,
+                                            [int(value) for value in right_colors[i][j]])
+                else:
+                    print_warning(f"wrong mode={mode}, the fixed mode will be used instead.")
+                    self.add_light_areaitem(region_hex_id, left_color)
 
-    def set_end_colors_line(self) -> None:
+            self.set_end_colors_line()
 
-        self.__save_line()
+    def __lower(self) -> None:
+        """Optimize and lower to commands the blocks that were not lowered yet."""
 
-        legend = "end_colors_line\n"
+        if self.__lowered:
+            return
 
-        cmd = self.__get_cmd()
-        cmd[0] = self.__computer.start_byte
-        cmd[1] = self.__computer.command_loop_block_end
+        operations = self.__operations
+        segment_start = self.__lowered_operations
 
-        self.__hex_id += 1
-        self.__commands.append(Command(legend, cmd))
+        self.__count = self.__lowered_count
+        del self.__legends[self.__lowered_count:]
 
-    def set_end_block_line(self) -> None:
+        save, block = self.__initial_state
+        self.__loop_hex_id = 1
 
-        self.__save_block()
+        for i in range(segment_start + 1, len(operations) + 1):
+            if i < len(operations) and operations[i][0] != OperationCodes._block:
+                continue
 
-        legend = "end_block_line\n\n"
+            self.__lowered_operations = segment_start
+            self.__lowered_count = self.__count
 
-        cmd = self.__get_cmd()
-        cmd[0] = self.__computer.start_byte
-        cmd[1] = self.__computer.command_transmit_execute
+            segment = optimize(operations[segment_start:i], self.__coalesce_regions)
 
-        self.__commands.append(Command(legend, cmd))
+            for problem in validate_slots(segment, self.__computer):
+                print_warning(problem)
 
-    def __add_item(self,
-                   area_hex_id: int,
-                   left_color: str,
-                   right_color: None | str,
-                   legend: str,
-                   cmd_color_type: int) -> None:
+            for operation in segment:
+                save, block = self.__lower_operation(operation, save, block)
 
-        self.__save_line()
+            segment_start = i
 
-        parsed_area_hex_id = self.__adapt_area_hex_id(area_hex_id)
-        adapted_left_color = self.__adapt_left_color(left_color)
+        self.__lowered = True
 
-        cmd = self.__get_cmd()
-        cmd[0] = self.__computer.start_byte
-        cmd[1] = cmd_color_type
-        cmd[2] = self.__hex_id
-        cmd[3] = parsed_area_hex_id[0]
-        cmd[4] = parsed_area_hex_id[1]
-        cmd[5] = parsed_area_hex_id[2]
-        cmd[6] = adapted_left_color[0]
+    def __lower_operation(self, operation: tuple, save: bool, block: int) -> tuple[bool, int]:
+        """Write the commands of an operation into the arena, and return the (save, block) state after it."""
 
-        if right_color is None:
-            cmd[7] = adapted_left_color[1]
-        else:
-            adapted_right_color = self.__adapt_right_color(right_color)
-            cmd[7] = adapted_left_color[1] + adapted_right_color[0]
-            cmd[8] = adapted_right_color[1]
+        computer = self.__computer
+        arena = self.__arena
+        code = operation[0]
 
-        self.__commands.append(Command(legend, cmd))
+        match code:
+            case OperationCodes._block:
+                self.__loop_hex_id = 1
+                return operation[1], operation[2]
 
-    @staticmethod
-    def __adapt_area_hex_id(area_hex_id: int) -> tuple[int, int, int]:
-        """
-            This method will parse an area_hex_id to a list of three values:
-
-            0x80    -> [0x0, 0x0, 0x80]
-            0x100   -> [0x0, 0x1, 0x0]
-            0x2     -> [0x0, 0x0, 0x2]
-            0x1     -> [0x0, 0x0, 0x1]
-            0x20    -> [0x0, 0x0, 0x20]
-            0x1c00  -> [0x0, 0x1c, 0x0]
-            0x4     -> [0x0, 0x0, 0x4]
-            0x8     -> [0x0, 0x0, 0x8]
-            0x40    -> [0x0, 0x0, 0x40]
-            0x200   -> [0x0, 0x2, 0x0]
-            
-            AlienFX MSG: gotta check the power button to understand it ...
-        """
-        # pyALienFX: takes the two first digits
-        value_0 = area_hex_id // 65536
+            case OperationCodes._color:
+                _, color_command, area_hex_id, left_rgb444, right_rgb444 = operation
+
+                if save:
+                    self.__save_line(block)
+                    if color_command == computer.command_set_color:
+                        self.__save_line(block)
 
-        # pyALienFX: takes the four first digits and remove the two first digits
-        value_1 = area_hex_id // 256 - value_0 * 256
+                left_color = _LEFT_COLOR_BYTES[left_rgb444]
 
-        # pyALienFX: same but remove the first 4 digits
-        value_2 = area_hex_id - value_0 * 65536 - value_1 * 256
+                offset = self.__new_command()
+                arena[offset + 1] = color_command
+                arena[offset + 2] = self.__loop_hex_id
+                arena[offset + 3] = area_hex_id // 65536
+                arena[offset + 4] = area_hex_id // 256 % 256
+                arena[offset + 5] = area_hex_id % 256
+                arena[offset + 6] = left_color[0]
 
-        return value_0, value_1, value_2
+                if right_rgb444 is None:
+                    arena[offset + 7] = left_color[1]
+                else:
+                    right_color = _RIGHT_COLOR_BYTES[right_rgb444]
+                    arena[offset + 7] = left_color[1] + right_color[0]
+                    arena[offset + 8] = right_color[1]
 
-    def __adapt_left_color(self, color: list[int] | str) -> tuple[int, int]:
+            case OperationCodes._loop_end:
+                if save:
+                    self.__save_line(block)
 
-        r, g, b = self.__adapt_color(color)
+                offset = self.__new_command()
+                arena[offset + 1] = computer.command_loop_block_end
+                self.__loop_hex_id += 1
 
-        c0 = r * 16 + g  # if r = 0xf > r*16 = 0xf0 > and b = 0xc r*16 + b 0xfc
-        c1 = b * 16
-        return c0, c1
+            case OperationCodes._speed:
+                if save:
+                    self.__save_line(block)
 
-    def __adapt_right_color(self, color: list[int] | str) -> tuple[int, int]:
+                offset = self.__new_command()
+                arena[offset + 1] = computer.command_set_speed
+                arena[offset + 3] = operation[1]
 
-        r, g, b = self.__adapt_color(color)
-        c0 = r  # if r = 0xf > r*16 = 0xf0 > and b = 0xc r*16 + b 0xfc
-        c1 = g * 16 + b
-        return c0, c1
+            case OperationCodes._reset:
+                if save:
+                    self.__save_line(block)
 
-    @staticmethod
-    def __adapt_color(color: list[int] | str) -> tuple[int, int, int]:
-        if isinstance(color, list):
-            color = rgb_to_hex(color)
+                offset = self.__new_command()
+                arena[offset + 1] = computer.command_reset
+                arena[offset + 2] = operation[1]
 
-        color = color.replace("#", '')
+            case OperationCodes._transmit:
+                if save:
+                    offset = self.__new_command()
+                    arena[offset + 1] = computer.command_save
+                    if self.__verbose:
+                        self.__legends.append("save")
 
-        r = int(color[0:2], 16) // 16
-        g = int(color[2:4], 16) // 16
-        b = int(color[4:6], 16) // 16
+                offset = self.__new_command()
+                arena[offset + 1] = computer.command_transmit_execute
 
-        return r, g, b
+            case OperationCodes._status:
+                offset = self.__new_command()
+                arena[offset + 1] = computer.command_get_status
 
-    def __get_cmd(self) -> list[int]:
-        return [self.__computer.fill_byte] * self.__computer.data_length
+            case OperationCodes._frame:
+                self.__lower_frame(operation, save, block)
+                return save, block
 
-    def __save_line(self) -> None:
+            case OperationCodes._commands:
+                commands = operation[1]
+                number = len(commands) // self.__data_length
+                offset = self.__new_commands(number)
+                arena[offset:offset + number * self.__data_length] = commands[:number * self.__data_length]
 
-        if self.__save:
-            legend = "__save_block, block={}".format(self.__block)
+                if self.__verbose:
+                    self.__legends.extend(["commands"] * number)
 
-            cmd = self.__get_cmd()
-            cmd[0] = self.__computer.start_byte
-            cmd[1] = self.__computer.command_save_next
-            cmd[2] = self.__block
+                return save, block
 
-            self.__commands.append(Command(legend, cmd))
+        if self.__verbose:
+            self.__legends.append(get_operation_text(operation, computer))
+
+        return save, block
+
+    def __lower_frame(self, operation: tuple, save: bool, block: int) -> None:
+
+        computer = self.__computer
+        length = self.__data_length
+
+        _, region_hex_ids, modes, left_colors, right_colors = operation
+        left_colors = left_colors // 16
+        right_colors = right_colors // 16
+        regions, slots = modes.shape
+
+        morph = modes == computer.command_set_morph_color
+
+        # Each item is a group of 3 records: [save_next, save_next, color], and the end of
+        # each loop is the group [save_next, loop_block_end, -]. The fixed colors have two
+        # save lines, the other colors and the loop ends only have one.
+        #
+        groups = numpy.full((regions, slots + 1, 3, length), computer.fill_byte, dtype=numpy.uint8)
+        groups[..., 0] = computer.start_byte
+        groups[:, :, :2, 1] = computer.command_save_next
+        groups[:, :, :2, 2] = block
+
+        colors = groups[:, :slots, 2]
+        colors[..., 1] = modes
+        colors[..., 2] = (self.__loop_hex_id + numpy.arange(regions, dtype=numpy.uint32)).astype(numpy.uint8)[:, None]
+        colors[..., 3] = (region_hex_ids >> 16 & 0xFF).astype(numpy.uint8)[:, None]
+        colors[..., 4] = (region_hex_ids >> 8 & 0xFF).astype(numpy.uint8)[:, None]
+        colors[..., 5] = (region_hex_ids & 0xFF).astype(numpy.uint8)[:, None]
+        colors[..., 6] = left_colors[..., 0] * 16 + left_colors[..., 1]
+        colors[..., 7] = left_colors[..., 2] * 16 + numpy.where(morph, right_colors[..., 0], 0)
+        colors[..., 8] = numpy.where(morph, right_colors[..., 1] * 16 + right_colors[..., 2], computer.fill_byte)
+
+        groups[:, slots, 1, 1] = computer.command_loop_block_end
+        groups[:, slots, 1, 2] = computer.fill_byte
+
+        present = numpy.zeros((regions, slots + 1, 3), dtype=bool)
+        present[:, :slots, 2] = True
+        present[:, slots, 1] = True
+        if save:
+            present[:, :slots, 1] = True
+            present[:, :slots, 0] = modes == computer.command_set_color
+            present[:, slots, 0] = True
+
+        data = groups.reshape(-1, length)[present.reshape(-1)]
+
+        offset = self.__new_commands(len(data))
+        self.__arena[offset:offset + data.size] = data.tobytes()
+        self.__loop_hex_id += regions
+
+        if self.__verbose:
+            self.__legends.extend(["frame"] * len(data))
+
+    def __save_line(self, block: int) -> None:
+        offset = self.__new_command()
+        self.__arena[offset + 1] = self.__computer.command_save_next
+        self.__arena[offset + 2] = block
+
+        if self.__verbose:
+            self.__legends.append(f"save_next, block={block}")
+
+    def __new_commands(self, number: int) -> int:
+        """Reserve `number` commands at the end of the arena, and return the offset of the first one."""
+
+        length = self.__data_length
+        offset = self.__count * length
+
+        while offset + number * length > len(self.__arena):
+            self.__arena.extend(self.__empty_command * max(len(self.__arena) // length, 1))
+
+        self.__count += number
+
+        return offset
+
+    def __new_command(self) -> int:
+        """
+            Append an empty command (filled with `fill_byte` and starting with `start_byte`)
+            to the arena, and return its offset. The arena doubles its size when it is full.
+        """
 
-    def __save_block(self) -> None:
+        length = self.__data_length
+        offset = self.__count * length
 
-        if self.__save:
-            legend = "__save_block"
+        if offset + length > len(self.__arena):
+            self.__arena.extend(self.__empty_command * max(self.__count, 1))
 
-            cmd = self.__get_cmd()
-            cmd[0] = self.__computer.start_byte
-            cmd[1] = self.__computer.command_save
+        self.__arena[offset:offset + length] = self.__empty_command
+        self.__arena[offset] = self.__computer.start_byte
+        self.__count += 1
 
-            self.__commands.append(Command(legend, cmd))
+        return offset
@@ -18,10 +18,14 @@
 #   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 import sys
+import hashlib
 
+from CCParser import CCParser
 from Engine.Driver import Driver
+from Engine.AsyncDriver import AsyncDriver
 from Computer.Computer import Computer
 from Engine.Constructor import Constructor
+from Engine.Poller import Poller, PollStatus
 from console_printer import print_warning, print_error, print_debug
 
 
@@ -29,11 +33,45 @@ class Controller:
 
     def __init__(self,
                  computer: Computer,
-                 fake: bool = False) -> None:
+                 fake: bool = False,
+                 delta_uploads: bool = False,
+                 poller: None | Poller = None,
+                 backend: str = 'pyusb',
+                 saved_blocks_file: None | str = None,
+                 coalesce_regions: bool = False) -> None:
+        """
+            :param bool delta_uploads:
+                Remember the last committed commands of each block, and only send the ones
+                that changed. It should not be used by tools that need to always write the
+                commands (like the block testing).
+            :param None|Poller poller: Used to wait until the device is ready.
+            :param str backend: USB backend of the driver, 'pyusb' or 'libusb' (asynchronous transfers).
+            :param None|str saved_blocks_file:
+                File to remember a hash of the last commands written to each saved block (save=True),
+                so they are not written again to the controller storage when they did not change.
+            :param bool coalesce_regions:
+                Merge the areas that are set with the same colors into one command (see `Constructor`).
+        """
 
         self.__driver = None
         self.__computer = None
         self.__constructor = None
+        self.__status_constructor = None
+        self.__patch_constructor = None
+
+        self.__poller = Poller() if poller is None else poller
+        self.__backend = backend
+        self.__coalesce_regions = coalesce_regions
+        self.__apply_polls = 0
+        self.__apply_commands = 0
+
+        self.__delta_uploads = delta_uploads
+        self.__blocks = []  # [save, block, reset_command, first_command_index]
+        self.__committed_blocks = {}  # (save, block): (reset_command, header, loops, trailer)
+
+        self.__saved_blocks_file = saved_blocks_file
+        self.__saved_blocks_ccp = None
+        self.__saved_hashes = {}  # block: hash of the commands stored in the controller
 
         self.set_computer(computer, fake=fake)
         if not self.is_ready():
@@ -47,24 +85,91 @@ class Controller:
                      fake: bool) -> bool:
 
         self.__computer = computer
-        driver = Driver(fake=fake)
+
+        match self.__backend:
+            case 'libusb':
+                driver = AsyncDriver(fake=fake)
+            case 'pyusb':
+                driver = Driver(fake=fake)
+            case _:
+                print_warning(f"Unknown backend={self.__backend}, pyusb will be used.")
+                driver = Driver(fake=fake)
+
         driver.load_device(self.__computer.vendor_id,
                            self.__computer.product_id)
 
+        self.__blocks.clear()
+        self.__committed_blocks.clear()
+        self.__saved_hashes.clear()
+
+        if self.__saved_blocks_file is not None:
+            self.__saved_blocks_ccp = CCParser(self.__saved_blocks_file, self.__computer.name)
+
         if driver.has_device():
             self.__driver = driver
-            self.__constructor = Constructor(computer)
+            self.__constructor = Constructor(computer, coalesce_regions=self.__coalesce_regions)
+            self.__status_constructor = Constructor(computer)
+            self.__status_constructor.set_get_status()
+            self.__patch_constructor = Constructor(computer)
             print_debug("Driver loaded with computer", self.__computer.name)
             return True
 
         self.__driver = None
         self.__constructor = None
+        self.__status_constructor = None
+        self.__patch_constructor = None
         print_error("The computer '{}' is not supported by this hardware.".format(self.__computer.name))
         return False
 
     def get_computer(self) -> None | Computer:
         return self.__computer
 
+    def get_last_apply_polls(self) -> int:
+        """Return the number of status polls done by the last `apply_config()`."""
+        return self.__apply_polls
+
+    def get_last_apply_commands(self) -> int:
+        """Return the number of commands uploaded by the last `apply_config()` (without the resets and the polls)."""
+        return self.__apply_commands
+
+    def get_handshakes_count(self) -> int:
+        """Return the number of USB configuration handshakes done by the driver."""
+        if self.__driver is None:
+            return 0
+
+        return self.__driver.get_handshakes_count()
+
+    def get_last_block_commands(self) -> bytes:
+        """Return the encoded commands of the last block (the reset command is not included)."""
+        if self.__constructor is None or len(self.__blocks) == 0:
+            return b''
+
+        return bytes(self.__constructor.get_commands_view(self.__blocks[-1][3]))
+
+    def get_committed_loops_lengths(self, block: int) -> tuple[int, ...]:
+        """Return the number of colors of each loop of the committed live block (save=False)."""
+
+        state = self.__committed_blocks.get((False, block))
+        if state is None:
+            return ()
+
+        return tuple(len(loop) // self.__computer.data_length - 1 for loop in state[2])
+
+    def get_committed_loops_regions(self, block: int) -> tuple[tuple[int, ...], ...]:
+        """
+            Return the regions mask of each color of each loop of the committed live block (save=False),
+            i.e. the `hex_id` of the AreaItems, OR-ed when the areas of the loop were coalesced.
+        """
+
+        state = self.__committed_blocks.get((False, block))
+        if state is None:
+            return ()
+
+        length = self.__computer.data_length
+        return tuple(tuple(loop[offset + 3] * 65536 + loop[offset + 4] * 256 + loop[offset + 5]
+                           for offset in range(0, len(loop) - length, length))
+                     for loop in state[2])
+
     def get_device_information(self) -> str:
         if self.__driver is None:
             return ""
@@ -74,24 +179,23 @@ class Controller:
     def clear_constructor(self) -> None:
         if self.__constructor is not None:
             self.__constructor.clear()
+            self.__blocks.clear()
 
     def add_block_line(self, save, block) -> None:
         if self.__constructor is not None:
             self.__constructor.set_block(save, block)
+            self.__blocks.append([save, block, None, len(self.__constructor)])
 
     def add_reset_line(self, res_cmd) -> bool:
+        """The reset is sent by `apply_config()`, only if the block must be fully uploaded."""
 
         if not self.is_ready():
             return False
 
-        self.__driver.take_over()
+        if len(self.__blocks) == 0:
+            self.__blocks.append([False, self.__computer.block_load_on_boot, None, 0])
 
-        constructor = Constructor(self.__computer)
-        constructor.set_get_status()
-        constructor.set_reset_area(res_cmd)
-
-        while not self.__device_is_ready():
-            self.__driver.write_constructor(constructor)
+        self.__blocks[-1][2] = res_cmd
 
         return True
 
@@ -100,63 +204,466 @@ class Controller:
             self.__constructor.set_speed(speed)
 
     def add_color_line(self, area_hex_id, mode, left_color, right_color=None) -> None:
+        if self.__constructor is not None:
+            self.__add_color(self.__constructor, area_hex_id, mode, left_color, right_color)
+
+    def add_frame(self, region_hex_ids, modes, left_colors, right_colors=None) -> None:
+        """Add one loop of colors for each region, see `Constructor.add_frame`."""
+        if self.__constructor is not None:
+            self.__constructor.add_frame(region_hex_ids, modes, left_colors, right_colors)
+
+    def add_commands(self, commands: bytes, block: None | int = None) -> None:
+        """
+            Add commands that were already encoded, like the ones of `get_last_block_commands()`.
+            If `block` is provided, the commands of a saved block are stamped with it.
+        """
+        if self.__constructor is not None:
+            self.__constructor.add_commands(commands, block)
+
+    def end_colors_line(self) -> None:
+        if self.__constructor is not None:
+            self.__constructor.set_end_colors_line()
 
-        if self.__constructor is None:
-            return
+    def end_block_line(self) -> None:
+        if self.__constructor is not None:
+            self.__constructor.set_end_block_line()
+
+    def apply_config(self) -> int:
+        """
+            :return: PollStatus._ready if the commands were written, PollStatus._timeout or
+                     PollStatus._unknown_command if the device did not become ready.
+        """
+
+        self.__apply_polls = 0
+        self.__apply_commands = 0
+
+        if not self.is_ready():
+            return PollStatus._unknown_command
+
+        saved_hashes = self.__get_saved_hashes()
+
+        if self.__delta_uploads:
+            blocks = self.__get_blocks()
+            uploads = self.__get_delta_uploads(blocks, saved_hashes)
+        else:
+            blocks = []
+            uploads = None
+
+        status = None
+        success = False
+
+        if uploads is None:
+
+            segments = self.__get_full_upload(saved_hashes)
+            self.__apply_commands = sum(len(segment) for segment in segments) // self.__computer.data_length
+
+            if self.__computer.throughput_mode:
+                if self.__write_resets() and all(self.__write_pipelined(segment) for segment in segments):
+                    status = PollStatus._ready
+                    success = True
+                else:
+                    print_debug("The throughput mode failed, using the careful mode.")
+
+            if status is None:
+                #
+                # The resets are not specific to a block, so when any of them is sent,
+                # all the blocks must be uploaded.
+                #
+                status = PollStatus._ready
+                for _, _, reset_command, _ in self.__blocks:
+                    if reset_command is not None:
+                        status = self.__send_reset(reset_command)
+                        if status != PollStatus._ready:
+                            break
+
+                # Wait until is OK to write.
+                #
+                if status == PollStatus._ready:
+                    status = self.__send_reset(self.__computer.reset_all_lights_on)
+
+                # Write the current constructor
+                #
+                if status != PollStatus._ready:
+                    success = False
+                elif len(segments) == 1 and len(segments[0]) == len(self.__constructor) * self.__computer.data_length:
+                    success = self.__driver.write_constructor(self.__constructor)
+                else:
+                    success = self.__driver.write_commands(command
+                                                           for segment in segments
+                                                           for command in self.__iter_commands(segment))
+
+        elif len(uploads) == 0:
+            print_debug("The blocks did not change, nothing to upload.")
+            return PollStatus._ready
+
+        else:
+            data = b''.join(uploads)
+            self.__apply_commands = len(data) // self.__computer.data_length
+            status, success = self.__write_delta(memoryview(data))
+
+        if status != PollStatus._ready:
+            print_warning("The device is not ready, status={}, polls={}".format(PollStatus._names[status],
+                                                                                self.__apply_polls))
+
+        if success and self.__delta_uploads:
+            self.__committed_blocks = dict(blocks)
+        else:
+            self.__committed_blocks.clear()
+
+        self.__update_saved_hashes(saved_hashes, success)
+
+        return status
+
+    def patch_color(self,
+                    block: int,
+                    loop_index: int,
+                    slot: int,
+                    mode: str,
+                    left_color: str,
+                    right_color: None | str = None) -> None | int:
+        """
+            Patch one color of the committed live block (save=False), and only write its loop
+            followed by the trailer of the block (transmit_execute). The loop hex id and the
+            regions of the color command are kept, only its mode and its colors are replaced.
+
+            :return: None if the color is not in the committed block (a full `apply_config()`
+                     is needed), otherwise the PollStatus of the write.
+        """
+
+        self.__apply_polls = 0
+
+        state = self.__committed_blocks.get((False, block))
+        if not self.is_ready() or state is None:
+            return None
+
+        length = self.__computer.data_length
+        reset_command, header, loops, trailer = state
+        if loop_index >= len(loops) or (slot + 1) * length >= len(loops[loop_index]):
+            return None
+
+        self.__patch_constructor.clear()
+        self.__add_color(self.__patch_constructor, 0, mode, left_color, right_color)
+        command = self.__patch_constructor.get_first_command()
+        if command is None:
+            return None
+
+        loop = bytearray(loops[loop_index])
+        offset = slot * length
+        loop[offset + 1] = command[1]
+        loop[offset + 6:offset + length] = command[6:]
+
+        status, success = self.__write_delta(memoryview(bytes(loop) + trailer))
+
+        if status != PollStatus._ready:
+            print_warning("The device is not ready, status={}, polls={}".format(PollStatus._names[status],
+                                                                                self.__apply_polls))
+
+        if success:
+            loops = loops[:loop_index] + (bytes(loop),) + loops[loop_index + 1:]
+            self.__committed_blocks[(False, block)] = (reset_command, header, loops, trailer)
+        else:
+            self.__committed_blocks.clear()
+
+        return status
 
-        elif mode == 'fixed':
-            self.__constructor.add_light_areaitem(area_hex_id, left_color)
+    def __add_color(self, constructor: Constructor, area_hex_id, mode, left_color, right_color=None) -> None:
+
+        if mode == 'fixed':
+            constructor.add_light_areaitem(area_hex_id, left_color)
 
         elif mode == 'blink':
-            self.__constructor.add_blink_areaitem(area_hex_id, left_color)
+            constructor.add_blink_areaitem(area_hex_id, left_color)
 
         elif mode == 'morph':
             if right_color is None:
                 print_warning(
                     'trying to set `morph` mode without a `right_color`.The `fixed` mode will be used instead.')
-                self.__constructor.add_light_areaitem(area_hex_id, left_color)
+                constructor.add_light_areaitem(area_hex_id, left_color)
             else:
-                self.__constructor.add_morph_areaitem(area_hex_id, left_color, right_color)
+                constructor.add_morph_areaitem(area_hex_id, left_color, right_color)
         else:
             print_warning('wrong mode=`{}`'.format(mode))
 
-    def end_colors_line(self) -> None:
-        if self.__constructor is not None:
-            self.__constructor.set_end_colors_line()
+    def __write_delta(self, data: memoryview) -> tuple[int, bool]:
+        """Write the modified loops of the live blocks, and return the (status, success) of the write."""
 
-    def end_block_line(self) -> None:
-        if self.__constructor is not None:
-            self.__constructor.set_end_block_line()
+        if self.__computer.throughput_mode:
+            if self.__write_pipelined(data):
+                return PollStatus._ready, True
 
-    def apply_config(self) -> None:
+            print_debug("The throughput mode failed, using the careful mode.")
 
-        if not self.is_ready():
-            return
+        # Wait until is OK to write, without resetting the current lights.
+        #
+        status = self.__wait_device()
 
-        # Wait until is OK to write.
+        # Write only the modified loops
         #
+        success = False
+        if status == PollStatus._ready:
+            success = self.__driver.write_commands(self.__iter_commands(data))
+
+        return status, success
+
+    def __get_block_ranges(self) -> list[tuple[bool, int, int, int, None | int]]:
+        """Return the (save, block, start, end, reset_command) of each block in the constructor."""
+
+        ranges = []
+        for i, (save, block, reset_command, start) in enumerate(self.__blocks):
+            end = self.__blocks[i + 1][3] if i + 1 < len(self.__blocks) else len(self.__constructor)
+            ranges.append((save, block, start, end, reset_command))
+
+        return ranges
+
+    def __get_saved_hashes(self) -> dict[int, str]:
+        """Return the hash of the commands of each saved block of the constructor."""
+
+        if self.__saved_blocks_ccp is None:
+            return {}
+
+        saved_hashes = {}
+        for save, block, start, end, reset_command in self.__get_block_ranges():
+            if save:
+                block_hash = hashlib.sha1(self.__constructor.get_commands_view(start, end))
+                block_hash.update(bytes((reset_command or 0,)))
+                saved_hashes[block] = block_hash.hexdigest()
+
+        return saved_hashes
+
+    def __get_stored_hash(self, block: int) -> str:
+
+        if block not in self.__saved_hashes:
+            self.__saved_hashes[block] = self.__saved_blocks_ccp.get_str_defval(f'block_{block}', '')
+
+        return self.__saved_hashes[block]
+
+    def __update_saved_hashes(self, saved_hashes: dict[int, str], success: bool) -> None:
+        """
+            Remember the hashes of the saved blocks that were written. If the apply failed,
+            the storage of the controller is unknown, so the hashes are forgotten.
+        """
+
+        for block, block_hash in saved_hashes.items():
+            if not success:
+                block_hash = ''
+
+            if self.__get_stored_hash(block) != block_hash:
+                self.__saved_hashes[block] = block_hash
+                self.__saved_blocks_ccp.write(f'block_{block}', block_hash)
+
+    def __get_full_upload(self, saved_hashes: dict[int, str]) -> list[memoryview]:
+        """
+            Return the segments of the constructor to upload, without the saved blocks
+            whose commands are already stored in the controller.
+        """
+
+        segments = []
+        start = 0
+        for save, block, block_start, block_end, _ in self.__get_block_ranges():
+            if save and block in saved_hashes and saved_hashes[block] == self.__get_stored_hash(block):
+                print_debug(f"The saved block={block} did not change, skipping it.")
+                if block_start > start:
+                    segments.append(self.__constructor.get_commands_view(start, block_start))
+                start = block_end
+
+        if start < len(self.__constructor) or len(segments) == 0:
+            segments.append(self.__constructor.get_commands_view(start))
+
+        return segments
+
+    def __get_delta_uploads(self,
+                            blocks: list[tuple[tuple[bool, int], tuple]],
+                            saved_hashes: dict[int, str]) -> None | list[bytes]:
+        """
+            Return the data that must be sent to pass from the committed blocks to the new blocks,
+            or None if the blocks must be fully uploaded. Since the colors are compared once
+            encoded, the colors quantized to the same hardware value are considered unchanged.
+
+            The saved blocks are stored by the controller (they are not the lights that are shown),
+            so the ones that changed are written entirely without their reset, and the loops of the
+            live block are still patched (after its header, to select the block again). The saved
+            blocks whose hash is the stored one are skipped.
+        """
+
+        uploads = []
+        saved_uploads = False
+
+        for key, state in blocks:
+            previous_state = self.__committed_blocks.get(key)
+
+            if previous_state is None:
+                return None
+
+            elif previous_state == state:
+                continue
+
+            save, block = key
+            reset_command, header, loops, trailer = state
+
+            if save:
+                if block not in saved_hashes or saved_hashes[block] != self.__get_stored_hash(block):
+                    uploads.append(header)
+                    uploads.extend(loops)
+                    uploads.append(trailer)
+                    saved_uploads = True
+                continue
+
+            previous_reset_command, previous_header, previous_loops, previous_trailer = previous_state
+
+            if reset_command != previous_reset_command or \
+                    header != previous_header or \
+                    trailer != previous_trailer or \
+                    len(loops) != len(previous_loops):
+                return None
+
+            if saved_uploads:
+                uploads.append(header)
+
+            for previous_loop, loop in zip(previous_loops, loops):
+                if previous_loop != loop:
+                    uploads.append(loop)
+
+            uploads.append(trailer)
+
+        return uploads
+
+    def __get_blocks(self) -> list[tuple[tuple[bool, int], tuple]]:
+        """
+            Split the constructor commands by blocks, and each block into:
+
+                (reset_command, header, loops, trailer)
+
+            The header contains the commands before the first color (speed, etc.), each loop
+            contains the colors of an area including its `loop_block_end` command, and the trailer
+            contains the remaining commands (save, transmit_execute).
+        """
+
+        blocks = self.__blocks
+        if len(blocks) == 0 or blocks[0][3] > 0:
+            blocks = [[False, self.__computer.block_load_on_boot, None, 0]] + blocks
+
+        length = self.__computer.data_length
+        color_commands = (self.__computer.command_set_color,
+                          self.__computer.command_set_blink_color,
+                          self.__computer.command_set_morph_color)
+
+        blocks_data = []
+        for i, (save, block, reset_command, start) in enumerate(blocks):
+
+            end = blocks[i + 1][3] if i + 1 < len(blocks) else len(self.__constructor)
+            data = bytes(self.__constructor.get_commands_view(start, end))
+
+            header_end = len(data)
+            loops = []
+            loop_start = None
+
+            for offset in range(0, len(data), length):
+                command = data[offset + 1]
+
+                if loop_start is None and command in color_commands:
+                    header_end = offset
+                    loop_start = offset
+
+                elif loop_start is not None and command == self.__computer.command_loop_block_end:
+                    loops.append(data[loop_start:offset + length])
+                    loop_start = offset + length
+
+            trailer_start = header_end if loop_start is None else loop_start
+
+            blocks_data.append(((save, block), (reset_command,
+                                                data[:header_end],
+                                                tuple(loops),
+                                                data[trailer_start:])))
+
+        return blocks_data
+
+    def __write_resets(self) -> bool:
+        """Write the reset commands of the blocks, without waiting for the device."""
+
+        constructor = Constructor(self.__computer)
+        for _, _, reset_command, _ in self.__blocks:
+            if reset_command is not None:
+                constructor.set_reset_area(reset_command)
+
+        if len(constructor) == 0:
+            return True
+
+        self.__driver.take_over()
+        return self.__driver.write_constructor(constructor)
+
+    def __write_pipelined(self, data: memoryview) -> bool:
+        """
+            Write the commands back to back, and only check the status of the device
+            before each `transmit_execute`. Return False if the device was not ready.
+        """
+
+        length = self.__computer.data_length
+        transmit_execute = self.__computer.command_transmit_execute
+
+        start = 0
+        for offset in range(0, len(data), length):
+            if data[offset + 1] != transmit_execute:
+                continue
+
+            if not self.__driver.write_commands(self.__iter_commands(data[start:offset])):
+                return False
+
+            status = self.__get_device_status()
+            self.__apply_polls += 1
+            if status != PollStatus._ready:
+                print_debug(f"status={PollStatus._names[status]} before transmit_execute.")
+                return False
+
+            start = offset
+
+        return self.__driver.write_commands(self.__iter_commands(data[start:]))
+
+    def __iter_commands(self, data: memoryview):
+        length = self.__computer.data_length
+        for offset in range(0, len(data), length):
+            yield data[offset:offset + length]
+
+    def __send_reset(self, res_cmd: int) -> int:
+        """Wait until the device is ready, and send the reset command each time that it is busy."""
+
+        self.__driver.take_over()
+
         constructor = Constructor(self.__computer)
         constructor.set_get_status()
-        constructor.set_reset_area()
+        constructor.set_reset_area(res_cmd)
 
-        while not self.__device_is_ready():
-            self.__driver.write_constructor(constructor)
+        return self.__wait_device(constructor)
 
-        # Write the current constructor
-        #
-        self.__driver.write_constructor(self.__constructor)
+    def __wait_device(self, busy_constructor: None | Constructor = None) -> int:
+
+        if busy_constructor is None:
+            status = self.__poller.wait(self.__get_device_status)
+        else:
+            status = self.__poller.wait(self.__get_device_status,
+                                        lambda: self.__driver.write_constructor(busy_constructor))
+
+        self.__apply_polls += self.__poller.get_polls()
 
-    def __device_is_ready(self) -> bool:
+        return status
+
+    def __get_device_status(self) -> int:
 
         if self.__driver is None or self.__computer is None:
             print_error("Calling device ready with no driver and computer.")
-            return True  # To stop the loops.
+            return PollStatus._unknown_command  # To stop the loops.
 
         self.__driver.take_over()
 
-        constructor = Constructor(self.__computer)
-        constructor.set_get_status()
+        self.__driver.write_constructor(self.__status_constructor)
+        msg = self.__driver.read_device(self.__status_constructor)
+
+        if msg is None or len(msg) == 0:
+            return PollStatus._busy
+
+        elif msg[0] == self.__computer.state_ready:
+            return PollStatus._ready
+
+        elif msg[0] == self.__computer.state_unknown_command:
+            return PollStatus._unknown_command
 
-        self.__driver.write_constructor(constructor)
-        msg = self.__driver.read_device(constructor)
-        return msg[0] == self.__computer.state_ready
+        return PollStatus._busy
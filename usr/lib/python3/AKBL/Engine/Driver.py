@@ -23,7 +23,7 @@ from traceback import format_exc
 
 from Engine import Constructor
 from Engine.FakeUSB import FakeUSB
-from console_printer import print_debug, print_error
+from console_printer import print_debug, print_error, is_debug_enabled
 
 
 class Driver:
@@ -33,6 +33,10 @@ class Driver:
         self.__usb_device = None
         self.__fake = fake
 
+        # The USB configuration is only set again after a transfer error or a new device.
+        self.__owns_interface = False
+        self.__handshakes_count = 0
+
         # Define I/O Request types
         self.__send_request_type = 33
         self.__send_request = 9
@@ -47,6 +51,8 @@ class Driver:
 
         print_debug(f"id_vendor={id_vendor}, id_product={id_product}")
 
+        self.__owns_interface = False
+
         if self.__fake:
             print_debug(f'faking usb device...', direct_output=True)
             self.__usb_device = FakeUSB()
@@ -67,31 +73,51 @@ class Driver:
             return False
         return True
 
+    def get_handshakes_count(self) -> int:
+        """Return the number of times that the USB configuration was set (see `take_over()`)."""
+        return self.__handshakes_count
+
     def device_information(self) -> str:
         return str(self.__usb_device)
 
-    def write_constructor(self, constructor: Constructor) -> None:
+    def write_constructor(self, constructor: Constructor) -> bool:
         # Todo: read the status?
 
-        print_debug('\n'.join(str(request) for request in constructor))
+        if is_debug_enabled():
+            print_debug(constructor.get_debug_text())
+
+        return self.write_commands(constructor)
+
+    def write_commands(self, commands) -> bool:
+        """
+            Send the commands to the device. The commands can be any buffer
+            (memoryview slices of a Constructor, bytearray, bytes, etc).
+        """
+
+        verbose = is_debug_enabled() and not self.__fake
 
         try:
-            for command in constructor:
+            for command in commands:
                 status = self.__usb_device.ctrl_transfer(self.__send_request_type,
                                                          self.__send_request,
                                                          self.__send_value,
                                                          self.__send_index,
                                                          command)
 
-                if not self.__fake:
+                if verbose:
                     print_debug(f"command output={status}")
 
         except Exception:
+            self.__owns_interface = False
             print_error(format_exc())
+            return False
+
+        return True
 
     def read_device(self, constructor: Constructor) -> None | int:
 
-        print_debug(str(constructor))
+        if is_debug_enabled():
+            print_debug(str(constructor))
 
         try:
             msg = self.__usb_device.ctrl_transfer(self.__read_request_type,
@@ -101,18 +127,24 @@ class Driver:
                                                   len(constructor.get_first_command()))
 
         except Exception:
+            self.__owns_interface = False
             print_error(format_exc())
             return None
 
-        if not self.__fake:
+        if not self.__fake and is_debug_enabled():
             print_debug(f"msg={msg}")
 
         return msg
 
     def take_over(self) -> None:
 
+        if self.__owns_interface:
+            return
+
         print_debug()
 
+        self.__handshakes_count += 1
+
         try:
             self.__usb_device.set_configuration()
         except Exception:
@@ -121,3 +153,6 @@ class Driver:
                 self.__usb_device.set_configuration()
             except Exception:
                 print_error(format_exc())
+                return
+
+        self.__owns_interface = True
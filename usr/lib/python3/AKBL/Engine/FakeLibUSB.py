@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import ctypes
+
+
+class FakeLibUSB:
+    """
+        This class replaces the libusb library of the AsyncDriver, for debugging in
+        computers that are not alienware. The submitted transfers are completed when
+        the events are handled, and the written commands are kept in `commands`.
+    """
+
+    def __init__(self, transfer_class: type[ctypes.Structure]):
+        """:param transfer_class: The ctypes structure of `libusb_transfer`."""
+
+        from AKBL.Computer.Computer import Computer
+
+        self.__computer = Computer()
+        self.__transfer_class = transfer_class
+        self.__allocated_transfers = []
+        self.__submitted_transfers = []
+
+        self.commands = []
+        self.max_in_flight = 0
+
+    def libusb_init(self, *_) -> int:
+        return 0
+
+    def libusb_exit(self, *_) -> None:
+        pass
+
+    def libusb_open_device_with_vid_pid(self, *_) -> int:
+        return 1
+
+    def libusb_close(self, *_) -> None:
+        pass
+
+    def libusb_set_configuration(self, *_) -> int:
+        return 0
+
+    def libusb_detach_kernel_driver(self, *_) -> int:
+        return 0
+
+    def libusb_claim_interface(self, *_) -> int:
+        return 0
+
+    def libusb_control_transfer(self, _handle, _request_type, _request, _value, _index, data, length, _timeout) -> int:
+        data[0] = self.__computer.state_ready
+        return length
+
+    def libusb_alloc_transfer(self, _iso_packets):
+        transfer = ctypes.pointer(self.__transfer_class())
+        self.__allocated_transfers.append(transfer)
+        return transfer
+
+    def libusb_free_transfer(self, transfer) -> None:
+        self.__allocated_transfers.remove(transfer)
+
+    def libusb_submit_transfer(self, transfer) -> int:
+        self.__submitted_transfers.append(transfer)
+        self.max_in_flight = max(self.max_in_flight, len(self.__submitted_transfers))
+        return 0
+
+    def libusb_handle_events_timeout_completed(self, *_) -> int:
+
+        submitted_transfers = self.__submitted_transfers
+        self.__submitted_transfers = []
+
+        for transfer in submitted_transfers:
+            contents = transfer.contents
+            self.commands.append(bytes(contents.buffer[8:contents.length]))
+            contents.status = 0
+            contents.actual_length = contents.length
+            contents.callback(transfer)
+
+        return 0
@@ -0,0 +1,273 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""
+    Operations recorded by the Constructor before being lowered to commands, and the
+    optimization passes that run over them. Each operation is a tuple whose first item
+    is one of the `OperationCodes`:
+
+        (_block, save, block)
+        (_reset, reset_command)
+        (_speed, speed)
+        (_color, color_command, area_hex_id, left_rgb444, None | right_rgb444)
+        (_loop_end,)
+        (_transmit,)
+        (_status,)
+        (_frame, region_hex_ids, modes, left_colors, right_colors)  # numpy arrays
+        (_commands, encoded_commands)
+
+    The passes never move an operation to another block, so the blocks can be lowered
+    independently.
+"""
+
+from Computer.Computer import Computer
+
+
+class OperationCodes:
+    _block = 0
+    _reset = 1
+    _speed = 2
+    _color = 3
+    _loop_end = 4
+    _transmit = 5
+    _status = 6
+    _frame = 7
+    _commands = 8
+
+
+def get_operation_text(operation: tuple, computer: Computer) -> str:
+
+    match operation[0]:
+        case OperationCodes._block:
+            return f"block save={operation[1]} block={operation[2]}"
+
+        case OperationCodes._reset:
+            return f"reset command={operation[1]}"
+
+        case OperationCodes._speed:
+            return f"speed speed={operation[1]}"
+
+        case OperationCodes._color:
+            _, color_command, area_hex_id, left_rgb444, right_rgb444 = operation
+
+            match color_command:
+                case computer.command_set_color:
+                    mode = 'fixed'
+                case computer.command_set_blink_color:
+                    mode = 'blink'
+                case computer.command_set_morph_color:
+                    mode = 'morph'
+                case _:
+                    mode = str(color_command)
+
+            text = f"color mode={mode} hex_id={area_hex_id:#x} left_color=#{left_rgb444:03x}"
+            if right_rgb444 is not None:
+                text += f" right_color=#{right_rgb444:03x}"
+
+            return text
+
+        case OperationCodes._loop_end:
+            return "loop_end"
+
+        case OperationCodes._transmit:
+            return "transmit"
+
+        case OperationCodes._status:
+            return "status"
+
+        case OperationCodes._frame:
+            return f"frame regions={len(operation[1])} slots={len(operation[2][0]) if len(operation[2]) > 0 else 0}"
+
+        case OperationCodes._commands:
+            return f"commands bytes={len(operation[1])}"
+
+    return f"unknown operation={operation}"
+
+
+def drop_duplicate_speeds(operations: list[tuple]) -> list[tuple]:
+    """
+        Drop the speeds that are overwritten by another speed before being used by a color,
+        and the speeds equal to the one already used in the block.
+    """
+
+    result = []
+    speed = None  # Speed used by the last colors of the block
+    pending_index = None  # Index of the last speed not yet used by a color
+
+    for operation in operations:
+        code = operation[0]
+
+        if code == OperationCodes._speed:
+            if pending_index is not None:
+                result[pending_index] = None
+                pending_index = None
+
+            if operation[1] != speed:
+                pending_index = len(result)
+                result.append(operation)
+
+            continue
+
+        elif code in (OperationCodes._color, OperationCodes._frame):
+            if pending_index is not None:
+                speed = result[pending_index][1]
+                pending_index = None
+
+        elif code in (OperationCodes._block, OperationCodes._reset, OperationCodes._commands):
+            # The state of the device is unknown after them.
+            speed = None
+            pending_index = None
+
+        result.append(operation)
+
+    return [operation for operation in result if operation is not None]
+
+
+def remove_redundant_resets(operations: list[tuple]) -> list[tuple]:
+    """Remove the resets that repeat the previous operation."""
+
+    result = []
+    for operation in operations:
+        if operation[0] == OperationCodes._reset and len(result) > 0 and result[-1] == operation:
+            continue
+
+        result.append(operation)
+
+    return result
+
+
+def merge_loops(operations: list[tuple], coalesce_regions: bool = False) -> list[tuple]:
+    """
+        Remove the loops that repeat the previous loop. If `coalesce_regions` is enabled, also merge
+        the loops that have the same colors at each slot, by OR-ing their region masks (the `hex_id`
+        of the regions are bit masks). The colors of each loop are kept as they are, so the
+        `max_commands` and the capabilities of the regions remain respected.
+
+        A loop is not merged if one of its regions was already set by a previous loop, so the order
+        in which each region is set does not change. The loops are only merged within the colors
+        that are between two other operations (speed, transmit, etc.).
+    """
+
+    result = []
+    section = []  # [key, colors]
+    section_keys = {}  # key: index of the loop in the section
+    section_mask = 0
+    loop = []
+
+    def flush_section():
+        nonlocal section_mask
+
+        for _, colors in section:
+            result.extend(colors)
+            result.append((OperationCodes._loop_end,))
+
+        section.clear()
+        section_keys.clear()
+        section_mask = 0
+
+    for operation in operations:
+        code = operation[0]
+
+        if code == OperationCodes._color:
+            loop.append(operation)
+            continue
+
+        elif code != OperationCodes._loop_end:
+            flush_section()
+            result.extend(loop)
+            result.append(operation)
+            loop = []
+            continue
+
+        if len(loop) > 0 and len(section) > 0 and section[-1][1] == loop:
+            loop = []
+            continue  # Same as the previous loop
+
+        elif len(loop) == 0 or not coalesce_regions:
+            section.append([None, loop])
+            loop = []
+            continue
+
+        key = tuple((color[1], color[3], color[4]) for color in loop)
+        loop_mask = 0
+        for color in loop:
+            loop_mask |= color[2]
+
+        if key not in section_keys or loop_mask & section_mask:
+            section_keys[key] = len(section)
+            section.append([key, loop])
+
+        else:
+            merged_colors = section[section_keys[key]][1]
+            for i, color in enumerate(loop):
+                merged = merged_colors[i]
+                merged_colors[i] = (merged[0], merged[1], merged[2] | color[2], merged[3], merged[4])
+
+        section_mask |= loop_mask
+        loop = []
+
+    flush_section()
+    result.extend(loop)
+
+    return result
+
+
+def validate_slots(operations: list[tuple], computer: Computer) -> list[str]:
+    """Return the problems of the loops that have more colors than the `max_commands` of their regions."""
+
+    problems = []
+    regions = computer.get_regions()
+    if len(regions) == 0:
+        return problems
+
+    min_max_commands = min(region._max_commands for region in regions)
+
+    loop = []
+    for operation in operations:
+        code = operation[0]
+
+        if code == OperationCodes._color:
+            loop.append(operation)
+            continue
+
+        elif code != OperationCodes._loop_end:
+            loop = []
+            continue
+
+        if len(loop) <= min_max_commands:
+            loop = []
+            continue
+
+        loop_mask = 0
+        for color in loop:
+            loop_mask |= color[2]
+
+        for region in regions:
+            if region._hex_id & loop_mask == region._hex_id and len(loop) > region._max_commands:
+                problems.append(f"The region={region._name} has {len(loop)} colors in a loop, "
+                                f"but it supports max_commands={region._max_commands}.")
+        loop = []
+
+    return problems
+
+
+def optimize(operations: list[tuple], coalesce_regions: bool = False) -> list[tuple]:
+    operations = drop_duplicate_speeds(operations)
+    operations = remove_redundant_resets(operations)
+    operations = merge_loops(operations, coalesce_regions)
+    return operations
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from time import monotonic, sleep
+from typing import Callable
+
+
+class PollStatus:
+    _ready = 0
+    _busy = 1
+    _unknown_command = 2
+    _timeout = 3
+
+    _names = {_ready: "ready",
+              _busy: "busy",
+              _unknown_command: "unknown command",
+              _timeout: "timeout"}
+
+
+class Poller:
+    """
+        Wait until the device is ready. The delay between two polls grows
+        exponentially (from `initial_delay` to `max_delay`), and the wait
+        is stopped after `timeout` seconds.
+    """
+
+    def __init__(self,
+                 initial_delay: float = 0.001,
+                 max_delay: float = 0.05,
+                 backoff: float = 2.0,
+                 timeout: float = 5.0) -> None:
+
+        self.__initial_delay = initial_delay
+        self.__max_delay = max_delay
+        self.__backoff = backoff
+        self.__timeout = timeout
+        self.__polls = 0
+
+    def __str__(self) -> str:
+        return "Poller: initial_delay={}, max_delay={}, backoff={}, timeout={}".format(self.__initial_delay,
+                                                                                      self.__max_delay,
+                                                                                      self.__backoff,
+                                                                                      self.__timeout)
+
+    def get_polls(self) -> int:
+        """Return the number of polls done by the last call to `wait()`."""
+        return self.__polls
+
+    def wait(self,
+             poll: Callable[[], int],
+             on_busy: None | Callable[[], object] = None) -> int:
+        """
+            :param poll: Function returning a PollStatus (_ready, _busy or _unknown_command).
+            :param on_busy: Function called each time that the device is busy.
+            :return: PollStatus._ready, PollStatus._unknown_command or PollStatus._timeout.
+        """
+
+        self.__polls = 0
+        deadline = monotonic() + self.__timeout
+        delay = self.__initial_delay
+
+        while True:
+            status = poll()
+            self.__polls += 1
+
+            if status != PollStatus._busy:
+                return status
+
+            elif monotonic() + delay > deadline:
+                return PollStatus._timeout
+
+            if on_busy is not None:
+                on_busy()
+
+            sleep(delay)
+            delay = min(delay * self.__backoff, self.__max_delay)
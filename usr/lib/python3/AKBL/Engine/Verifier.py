@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""
+    Verify the themes and the color requests against the regions of a computer, before
+    writing anything to the device. The verification returns:
+
+        + A plan: a list of loops (one for each area or region), and each loop is a list
+          of colors (hex_id, mode, left_color, right_color) that the regions support.
+
+        + A report: a list of dictionaries {region, slot, problem, fallback}, one for each
+          color that had to be modified, folded or dropped.
+
+    When a loop has more colors than the `max_commands` of its region, and its colors are a
+    repetition of a shorter sequence, only the first sequence is kept (the loop is cycled by
+    the device, so the animation and its timing do not change). Otherwise, the last colors
+    are dropped.
+"""
+
+from Computer.Computer import Computer
+from Computer.Region import Region
+from Theme.Theme import Theme
+
+
+class VerificationProblems:
+    _max_commands = 'max_commands_exceeded'
+    _blink = 'blink_not_supported'
+    _morph = 'morph_not_supported'
+
+
+class VerificationFallbacks:
+    _dropped = 'dropped'
+    _fixed = 'fixed'
+    _folded = 'folded'
+
+
+def verify_theme(computer: Computer, theme: Theme) -> tuple[list[list[tuple[int, str, str, str]]], list[dict]]:
+
+    plan = []
+    report = []
+
+    for area in theme.get_areas():
+        region = computer.get_region_by_name(area._name)
+        if region is None:
+            region = area
+
+        colors = [(areaitem.get_hex_id(), areaitem.get_mode(), areaitem.get_left_color(), areaitem.get_right_color())
+                  for areaitem in area.get_items()]
+
+        plan.append(_verify_region_colors(region, colors, report))
+
+    return plan, report
+
+
+def verify_colors(computer: Computer,
+                  mode: str,
+                  left_colors: list[str],
+                  right_colors: list[str]) -> tuple[list[list[tuple[int, str, str, str]]], list[dict]]:
+
+    plan = []
+    report = []
+
+    for region in computer.get_regions():
+        colors = [(region._hex_id, mode, left_color, right_color)
+                  for left_color, right_color in zip(left_colors, right_colors)]
+
+        plan.append(_verify_region_colors(region, colors, report))
+
+    return plan, report
+
+
+def get_report_text(report: list[dict]) -> str:
+    return '\n'.join(f"region={problem['region']} slot={problem['slot']}: "
+                     f"{problem['problem']}, fallback={problem['fallback']}" for problem in report)
+
+
+def _verify_region_colors(region: Region,
+                          colors: list[tuple[int, str, str, str]],
+                          report: list[dict]) -> list[tuple[int, str, str, str]]:
+
+    legal_colors = []
+    mode_problems = []  # (slot, problem)
+
+    for slot, (hex_id, mode, left_color, right_color) in enumerate(colors):
+
+        if (mode == 'blink' and not region._can_blink) or (mode == 'morph' and not region._can_morph):
+            mode_problems.append((slot, VerificationProblems._blink if mode == 'blink' else VerificationProblems._morph))
+            mode = 'fixed'
+
+        legal_colors.append((hex_id, mode, left_color, right_color))
+
+    length = len(legal_colors)
+    fallback = None
+
+    if length > region._max_commands:
+        period = _get_colors_period(legal_colors)
+        if period <= region._max_commands:
+            fallback = VerificationFallbacks._folded
+            length = period
+        else:
+            fallback = VerificationFallbacks._dropped
+            length = region._max_commands
+
+    # The mode problems of the slots that are not kept are not reported.
+    for slot, problem in mode_problems:
+        if slot < length:
+            report.append({'region': region._name,
+                           'slot': slot,
+                           'problem': problem,
+                           'fallback': VerificationFallbacks._fixed})
+
+    for slot in range(length, len(legal_colors)):
+        report.append({'region': region._name,
+                       'slot': slot,
+                       'problem': VerificationProblems._max_commands,
+                       'fallback': fallback})
+
+    return legal_colors[:length]
+
+
+def _get_colors_period(colors: list[tuple[int, str, str, str]]) -> int:
+    """
+        Return the length of the shortest sequence of colors that repeated gives the colors.
+        The hex_id are ignored, and the right color is only compared for the morph mode.
+    """
+
+    keys = [(mode, left_color.lower(), right_color.lower() if mode == 'morph' else None)
+            for _, mode, left_color, right_color in colors]
+
+    for period in range(1, len(keys)):
+        if len(keys) % period == 0 and all(keys[i] == keys[i - period] for i in range(period, len(keys))):
+            return period
+
+    return len(keys)
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from traceback import format_exc
+from threading import Thread, Condition, Event
+from typing import Callable
+
+from console_printer import print_error, print_debug
+
+
+class Job:
+
+    def __init__(self, function: Callable, args: tuple) -> None:
+        self.__function = function
+        self.__args = args
+        self.__result = None
+        self.__done = Event()
+        self.__superseded_jobs = []
+
+    def __str__(self) -> str:
+        return "Job: function={}, done={}".format(self.__function.__name__, self.__done.is_set())
+
+    def supersede(self, job) -> None:
+        """The job will not be executed, it will receive the result of this job."""
+        self.__superseded_jobs.append(job)
+
+    def run(self) -> None:
+        try:
+            self.__result = self.__function(*self.__args)
+        except Exception:
+            print_error(format_exc())
+            self.__result = None
+
+        self.finish(self.__result)
+
+    def finish(self, result) -> None:
+        self.__result = result
+        for job in self.__superseded_jobs:
+            job.finish(result)
+        self.__superseded_jobs.clear()
+        self.__done.set()
+
+    def is_done(self) -> bool:
+        return self.__done.is_set()
+
+    def wait(self, timeout: None | float = None) -> object:
+        """Wait until the job (or the job that superseded it) is executed, and return its result."""
+        self.__done.wait(timeout)
+        return self.__result
+
+
+class Worker:
+    """
+        Thread owning the device. The jobs are executed one by one, and when
+        a new job is submitted while another one is waiting, the newest one
+        replaces it (latest wins), so the intermediate states are not written.
+    """
+
+    def __init__(self, name: str = "AKBL-Device") -> None:
+        self.__condition = Condition()
+        self.__pending_job = None
+        self.__running = True
+
+        self.__thread = Thread(target=self.__run, name=name, daemon=True)
+        self.__thread.start()
+
+    def submit(self, function: Callable, *args) -> Job:
+
+        job = Job(function, args)
+
+        with self.__condition:
+            if self.__pending_job is not None:
+                print_debug(f"superseding {self.__pending_job}")
+                job.supersede(self.__pending_job)
+
+            self.__pending_job = job
+            self.__condition.notify()
+
+        return job
+
+    def stop(self) -> None:
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+
+        self.__thread.join()
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                while self.__running and self.__pending_job is None:
+                    self.__condition.wait()
+
+                if not self.__running:
+                    if self.__pending_job is not None:
+                        self.__pending_job.finish(None)
+                        self.__pending_job = None
+                    return
+
+                job = self.__pending_job
+                self.__pending_job = None
+
+            job.run()
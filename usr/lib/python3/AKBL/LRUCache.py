@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from threading import Lock
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """
+        Thread safe cache that discards the least recently used entries
+        when it has more than `max_size` entries.
+    """
+
+    def __init__(self, max_size: int = 64) -> None:
+        self.__max_size = max_size
+        self.__entries = OrderedDict()
+        self.__lock = Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key: Hashable) -> Any:
+        """Return the value of the key, or None if it is not cached."""
+
+        with self.__lock:
+            if key not in self.__entries:
+                self.__misses += 1
+                return None
+
+            self.__hits += 1
+            self.__entries.move_to_end(key)
+            return self.__entries[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+
+            while len(self.__entries) > self.__max_size:
+                self.__entries.popitem(last=False)
+
+    def remove_if(self, condition: Callable[[Hashable], bool]) -> dict[Hashable, Any]:
+        """Remove the entries whose key matches the condition, and return them."""
+
+        with self.__lock:
+            entries = {key: value for key, value in self.__entries.items() if condition(key)}
+            for key in entries:
+                del self.__entries[key]
+
+        return entries
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+
+    def get_stats(self) -> dict[str, int | float]:
+        with self.__lock:
+            requests = self.__hits + self.__misses
+            return {'hits': self.__hits,
+                    'misses': self.__misses,
+                    'hit_rate': self.__hits / requests if requests > 0 else 0.0,
+                    'size': len(self.__entries),
+                    'max_size': self.__max_size}
@@ -39,6 +39,8 @@ class Paths:
         self._computers_configuration_dir = "/usr/share/AKBL/computers"
         self._default_computer_file = '/etc/AKBL/default_computer.ini'
         self._daemon_pyro_file = '/etc/AKBL/pyro-address'
+        self._saved_blocks_file = '/etc/AKBL/saved-blocks.ini'
+        self._libusb_file = os.path.join(self._akbl_share_dir, 'libusb-1.0.so.0')
 
         # User
         #
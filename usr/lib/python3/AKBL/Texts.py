@@ -30,6 +30,9 @@ class Texts:
     class Commands:
         _daemon_off = "Error: The daemon is off or the connection couldn't be established."
         _wrong_argument = '''Error: wrong argument. use "akbl --help"'''
+        _pack_error = "Error: The theme pack could not be written or read."
+        _pack_exported = "{} themes exported to {}"
+        _pack_imported = "{} of {} themes imported."
         _help = '''
 Usage:
 
@@ -41,6 +44,11 @@ Usage:
     --off                             Turn off the computer lights.
     --switch                          Switch the computer lights on/off.
     --set-theme <theme_name>          Set the selected theme (on).
+    --list-themes                     List the themes of the user.
+    --export-pack <file>              Export the themes of the user to a theme pack (zip).
+    --import-pack <file> [--overwrite]
+                                      Import the themes of a theme pack, the existing
+                                      themes are only replaced with --overwrite.
 
     --model-chooser-gui               Launch the model chooser from a GUI.
     --model-chooser-cmd               Launch the model chooser from a CMD.
@@ -85,6 +93,7 @@ Usage:
         _theme_confirm_delete = "Are you sure that you want to delete {}?"
         _theme_choose = "Choose an AKBL theme"
         _theme_duplicate = "A theme with this name already exists. Do you want to overwrite it?"
+        _theme_import_problems = "Some lines of the theme are not valid, they will be ignored or replaced. Do you want to import it?"
         _theme_must_saved = "The theme {} must be saved before applying it."
         _no_computer_title = "Undefined Computer"
         _no_computer = 'It is mandatory to select a computer model. Run as root \n"akbl --model-chooser-gui"\nand restart your computer.'
\ No newline at end of file
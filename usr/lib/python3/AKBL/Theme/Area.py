@@ -24,6 +24,10 @@ from Computer.Region import Region
 
 
 class Area(Region):
+    """
+        The AreaItems of an area are never modified in place, they are replaced. So the clones of
+        an area share the list of AreaItems, and the list is only copied when one of them modifies it.
+    """
 
     def __init__(self, region) -> None:
         super().__init__(name=region._name,
@@ -36,6 +40,7 @@ class Area(Region):
 
         self.__current_areaitem_hex_id = self._hex_id
         self.__area_items = []
+        self.__shared_items = False  # True if the list of AreaItems can be shared with a clone
 
     def __str__(self) -> str:
 
@@ -56,21 +61,70 @@ class Area(Region):
 {area_items_description}
 '''
 
+    def clone(self) -> 'Area':
+        """Return a copy of the area, its AreaItems are shared until one of the areas is modified."""
+
+        area = copy(self)
+        self.__shared_items = True
+        area.__shared_items = True
+
+        return area
+
+    def has_same_items(self, area: 'Area') -> bool:
+        """Return True if both areas share the same AreaItems (i.e. a clone that was not modified)."""
+        return self.__area_items is area.__area_items
+
     def add_item(self, areaitem: AreaItem) -> None:
+        """The area takes the AreaItem, other objects (i.e. the widgets of the GUI) are copied to an AreaItem."""
+
+        if type(areaitem) is not AreaItem:
+            areaitem = AreaItem(mode=areaitem.get_mode(),
+                                left_color=areaitem.get_left_color(),
+                                right_color=areaitem.get_right_color())
+
+        self.__own_items()
         areaitem.set_hex_id(self.__current_areaitem_hex_id)
         self.__area_items.append(areaitem)
         self.__current_areaitem_hex_id += 1
 
+    def insert_item_at(self, column_index: int, areaitem: AreaItem) -> None:
+        self.__own_items()
+        self.__area_items.insert(column_index, areaitem)
+        self.__update_hex_ids()
+
+    def modify_item_at(self, column_index: int, left_color: str, right_color: str, mode: str) -> None:
+        areaitem = copy(self.__area_items[column_index])
+        areaitem.set_left_color(left_color)
+        areaitem.set_right_color(right_color)
+        areaitem.set_mode(mode)
+
+        self.__own_items()
+        self.__area_items[column_index] = areaitem
+
     def remove_item_at(self, column_index: int) -> None:
-        areaitem = self.__area_items[column_index]
-        self.__area_items.remove(areaitem)
-        self.__current_areaitem_hex_id = self._hex_id
-        for areaitem in self.__area_items:
-            areaitem.set_hex_id(self.__current_areaitem_hex_id)
-            self.__current_areaitem_hex_id += 1
+        self.__own_items()
+        del self.__area_items[column_index]
+        self.__update_hex_ids()
 
     def get_item_at(self, column_index: int) -> AreaItem:
         return self.__area_items[column_index]
 
     def get_items(self) -> list[AreaItem]:
         return copy(self.__area_items)
+
+    def __own_items(self) -> None:
+        """Copy the list of AreaItems before modifying it, if it can be shared."""
+
+        if self.__shared_items:
+            self.__area_items = list(self.__area_items)
+            self.__shared_items = False
+
+    def __update_hex_ids(self) -> None:
+        self.__current_areaitem_hex_id = self._hex_id
+        for column_index, areaitem in enumerate(self.__area_items):
+            if areaitem.get_hex_id() != self.__current_areaitem_hex_id:
+                areaitem = copy(areaitem)
+                areaitem.set_hex_id(self.__current_areaitem_hex_id)
+                self.__area_items[column_index] = areaitem
+
+            self.__current_areaitem_hex_id += 1
@@ -82,3 +82,7 @@ class AreaItem:
 
     def get_right_color(self) -> str:
         return self.__right_color
+
+    def get_values(self) -> tuple[str, str, str]:
+        """Return (mode, left_color, right_color)."""
+        return self.__mode, self.__left_color, self.__right_color
@@ -0,0 +1,328 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""
+    Index of the themes of a directory, stored in `<themes_dir>/.catalog.json`. Each
+    theme (.cfg file) has an entry {mtime_ns, size, hash, last_used}, the last used
+    time is the mtime of the file (the Daemon touches the themes that it sets).
+
+    + The catalogs that watch their directory (Daemon, GUI, Indicator) are updated with
+      inotify, and only the files of the events are read. If inotify is not available,
+      the directory is scanned on each refresh (the files are only read if they changed).
+
+    + The other catalogs (command line) trust the stored entries, only the names of the
+      directory are listed to add or remove the themes that changed.
+"""
+
+import os
+import json
+import struct
+import ctypes
+import hashlib
+import threading
+from traceback import format_exc
+
+from utils import write_file_atomically
+from console_printer import print_warning, print_debug
+
+_CATALOG_FILENAME = '.catalog.json'
+_CATALOG_VERSION = 1
+
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+
+_WATCH_MASK = _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | \
+              _IN_DELETE_SELF | _IN_MOVE_SELF
+
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+
+class Catalog:
+
+    def __init__(self, themes_dir: str, watch: bool = False) -> None:
+
+        self.__themes_dir = themes_dir
+        self.__catalog_file = os.path.join(themes_dir, _CATALOG_FILENAME)
+        self.__lock = threading.Lock()
+
+        self.__entries = {}  # name: {mtime_ns, size, hash, last_used}
+        self.__file_mtime_ns = None  # Of the catalog file, when it was loaded or saved
+        self.__watch = watch
+        self.__inotify_fd = None
+
+        if watch:
+            self.__inotify_fd = _add_inotify_watch(themes_dir)
+            if self.__inotify_fd is None:
+                print_debug(f"inotify is not available, the themes of {themes_dir} will be scanned.")
+
+        self.__load()
+
+        # The directory could change while it was not watched
+        self.__scan(only_names=not watch)
+
+    def __del__(self):
+        self.close()
+
+    def close(self) -> None:
+        if self.__inotify_fd is not None:
+            os.close(self.__inotify_fd)
+            self.__inotify_fd = None
+
+    def is_watching(self) -> bool:
+        return self.__watch
+
+    def get_names(self) -> list[str]:
+        with self.__lock:
+            self.__refresh()
+            return sorted(self.__entries.keys())
+
+    def get_last_theme_name(self) -> None | str:
+        with self.__lock:
+            self.__refresh()
+
+            if len(self.__entries) == 0:
+                return None
+
+            return max(self.__entries, key=lambda name: self.__entries[name]['last_used'])
+
+    def get_entry(self, name: str) -> None | dict:
+        """Return a copy of the entry {mtime_ns, size, hash, last_used} of a theme."""
+
+        with self.__lock:
+            self.__refresh()
+
+            entry = self.__entries.get(name)
+            if entry is None:
+                return None
+
+            return dict(entry)
+
+    def __refresh(self) -> None:
+
+        if self.__inotify_fd is not None:
+            self.__read_events()
+
+        elif self.__watch:
+            self.__scan()
+
+        else:
+            if self.__get_file_mtime_ns() != self.__file_mtime_ns:
+                self.__load()  # Updated by another process
+
+            self.__scan(only_names=True)
+
+    def __read_events(self) -> None:
+
+        names = set()
+        overflow = False
+
+        while True:
+            try:
+                data = os.read(self.__inotify_fd, 65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                print_warning(format_exc())
+                overflow = True
+                break
+
+            if len(data) == 0:
+                break
+
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', errors='surrogateescape')
+                offset += length
+
+                if mask & (_IN_Q_OVERFLOW | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+                    overflow = True
+                elif name.endswith('.cfg'):
+                    names.add(name[:-4])
+
+        if overflow:
+            self.__scan()
+
+        elif len(names) > 0:
+            changed = False
+            for name in names:
+                changed |= self.__update_entry(name)
+
+            if changed:
+                self.__save()
+
+    def __scan(self, only_names: bool = False) -> None:
+        """
+            Update the entries of all the themes, only the files whose stat changed are read.
+            If `only_names` is enabled, only the themes that were added or removed are updated.
+        """
+
+        try:
+            names = {filename[:-4] for filename in os.listdir(self.__themes_dir) if filename.endswith('.cfg')}
+        except OSError:
+            self.__entries.clear()
+            return
+
+        changed = False
+        for name in list(self.__entries.keys()):
+            if name not in names:
+                del self.__entries[name]
+                changed = True
+
+        for name in names:
+            if not only_names or name not in self.__entries:
+                changed |= self.__update_entry(name)
+
+        if changed or self.__file_mtime_ns is None:
+            self.__save()
+
+    def __update_entry(self, name: str) -> bool:
+        """Update the entry of a theme, and return True if it changed."""
+
+        path = os.path.join(self.__themes_dir, name + '.cfg')
+        entry = self.__entries.get(name)
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            if entry is None:
+                return False
+
+            del self.__entries[name]
+            return True
+
+        if entry is not None and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return False
+
+        try:
+            with open(path, mode='rb') as f:
+                theme_hash = hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            print_warning(format_exc())
+            return False
+
+        self.__entries[name] = {'mtime_ns': stat.st_mtime_ns,
+                                'size': stat.st_size,
+                                'hash': theme_hash,
+                                'last_used': stat.st_mtime_ns}
+
+        return True
+
+    def __get_file_mtime_ns(self) -> None | int:
+        try:
+            return os.stat(self.__catalog_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def __load(self) -> None:
+
+        file_mtime_ns = self.__get_file_mtime_ns()
+
+        try:
+            with open(self.__catalog_file, mode='rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+
+        if not isinstance(data, dict) or data.get('version') != _CATALOG_VERSION:
+            self.__entries = {}
+            self.__file_mtime_ns = None
+            return
+
+        self.__entries = data['themes']
+        self.__file_mtime_ns = file_mtime_ns
+
+    def __save(self) -> None:
+        """
+            Write the catalog atomically (see `write_file_atomically`). The processes only write in the
+            directories that they own: the catalog of the Daemon (root) remains in memory, so root never
+            creates files in the directories of the users.
+        """
+
+        try:
+            if os.stat(self.__themes_dir).st_uid != os.geteuid():
+                self.__file_mtime_ns = None
+                return
+
+            data = json.dumps({'version': _CATALOG_VERSION,
+                               'themes': self.__entries})
+
+            write_file_atomically(self.__catalog_file, data.encode('utf-8'))
+
+        except OSError:
+            # The catalog remains usable in memory (i.e. read only directory)
+            print_debug(f"The catalog could not be written:\n{format_exc()}")
+            self.__file_mtime_ns = None
+            return
+
+        self.__file_mtime_ns = self.__get_file_mtime_ns()
+
+
+def get_catalog(themes_dir: str, watch: bool = False) -> Catalog:
+    """
+        Return the catalog of a themes directory, there is one catalog per directory and process.
+        The processes that stay open should call it with `watch=True` before using the theme factory.
+    """
+
+    key = os.path.abspath(themes_dir)
+
+    with _CATALOGS_LOCK:
+        catalog = _CATALOGS.get(key)
+        if catalog is None or (watch and not catalog.is_watching()):
+            if catalog is not None:
+                catalog.close()
+
+            catalog = Catalog(themes_dir, watch)
+            _CATALOGS[key] = catalog
+
+    return catalog
+
+
+def _add_inotify_watch(path: str) -> None | int:
+    """Return a non-blocking inotify file descriptor watching the path, or None if inotify is not available."""
+
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        inotify_init1 = libc.inotify_init1
+        inotify_add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+
+    inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+
+    fd = inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        return None
+
+    if inotify_add_watch(fd, os.fsencode(path), _WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+
+    return fd
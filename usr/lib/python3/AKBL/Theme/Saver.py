@@ -0,0 +1,158 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import time
+import threading
+from traceback import format_exc
+
+from Theme.Theme import write_theme_file
+from console_printer import print_error
+
+
+class Saver:
+    """
+        Write-behind saves of the themes (i.e. the autosave of the GUI). A theme is written
+        by a thread `delay` seconds after its first save request, and the requests received
+        in the meantime are coalesced in that write (the last one is written). The theme is
+        serialized when the save is requested, so the thread never reads a theme that the
+        GUI is modifying.
+    """
+
+    def __init__(self, delay: float = 0.5, fsync: bool = False) -> None:
+
+        self.__delay = delay
+        self.__fsync = fsync
+
+        self.__pending = {}  # path: (data, deadline)
+        self.__writing = {}  # path: number of its writes that are running
+        self.__condition = threading.Condition()
+        self.__write_lock = threading.Lock()
+        self.__thread = None
+        self.__stop = False
+
+        # Of the writes and of the requests, for the statistics
+        self.__writes = 0
+        self.__requests = 0
+
+    def save(self, theme) -> None:
+        """Request a save of the theme, it returns immediately."""
+
+        path = theme.get_path()
+        data = theme.get_data()
+
+        with self.__condition:
+            self.__requests += 1
+
+            pending = self.__pending.get(path)
+            deadline = time.monotonic() + self.__delay if pending is None else pending[1]
+            self.__pending[path] = (data, deadline)
+
+            if self.__thread is None:
+                self.__stop = False
+                self.__thread = threading.Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+
+            self.__condition.notify_all()
+
+    def discard(self, path: str) -> None:
+        """Forget the pending save of a theme, and wait for its write if it started (i.e. before deleting its file)."""
+
+        with self.__condition:
+            self.__pending.pop(path, None)
+
+            while path in self.__writing:
+                self.__condition.wait()
+
+    def flush(self) -> None:
+        """Write all the pending saves now, from the calling thread."""
+
+        with self.__condition:
+            saves = self.__pop_pending(list(self.__pending))
+
+        for path, data in saves:
+            self.__write(path, data)
+
+    def close(self) -> None:
+        """Write the pending saves, and stop the thread."""
+
+        with self.__condition:
+            self.__stop = True
+            self.__condition.notify_all()
+            thread = self.__thread
+            self.__thread = None
+
+        if thread is not None:
+            thread.join()
+
+        self.flush()
+
+    def get_stats(self) -> dict:
+        with self.__condition:
+            return {'requests': self.__requests,
+                    'writes': self.__writes,
+                    'pending': len(self.__pending)}
+
+    def __run(self) -> None:
+
+        while True:
+            with self.__condition:
+                while not self.__stop:
+                    if len(self.__pending) == 0:
+                        self.__condition.wait()
+                        continue
+
+                    timeout = min(deadline for _, deadline in self.__pending.values()) - time.monotonic()
+                    if timeout <= 0:
+                        break
+
+                    self.__condition.wait(timeout)
+
+                if self.__stop:
+                    return
+
+                now = time.monotonic()
+                saves = self.__pop_pending([path for path, (_, deadline) in self.__pending.items() if deadline <= now])
+
+            for path, data in saves:
+                self.__write(path, data)
+
+    def __pop_pending(self, paths: list[str]) -> list[tuple[str, bytes]]:
+        """Pop the pending saves of the paths, they are marked as being written. The condition must be held."""
+
+        for path in paths:
+            self.__writing[path] = self.__writing.get(path, 0) + 1
+
+        return [(path, self.__pending.pop(path)[0]) for path in paths]
+
+    def __write(self, path: str, data: bytes) -> None:
+        try:
+            with self.__write_lock:
+                write_theme_file(path, data, self.__fsync)
+            written = True
+        except Exception:
+            print_error(format_exc())
+            written = False
+
+        with self.__condition:
+            self.__writing[path] -= 1
+            if self.__writing[path] == 0:
+                del self.__writing[path]
+
+            if written:
+                self.__writes += 1
+            self.__condition.notify_all()
@@ -17,10 +17,20 @@
 #   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 import os
+from typing import Iterator
 
+from utils import write_file_atomically
 from Theme.Area import Area
+from Theme.binary import encode_theme, _BINARY_EXTENSION
 from console_printer import print_warning, print_error
 
+_TEXT_HEADER = '''
+#############################################
+#####            AKBL Theme             #####
+#############################################
+
+'''
+
 
 class Theme:
 
@@ -32,31 +42,29 @@ class Theme:
         self.__path = ""
         self.__areas = {}
         self.__speed = 1
+        self.__power_blocks = ()  # Names of the power states whose blocks are also programmed
 
     def __str__(self):
+        return ''.join(self.__iter_text())
 
-        theme_text = f'''
-#############################################
-#####            AKBL Theme             #####
-#############################################
+    def __iter_text(self) -> Iterator[str]:
+        """Yield the parts of the .cfg text of the theme, they are joined once by `__str__`."""
 
-speed={self.__speed}
-\n'''
+        yield _TEXT_HEADER
+        yield f'speed={self.__speed}\n'
+
+        if len(self.__power_blocks) > 0:
+            yield f"power_blocks={'|'.join(self.__power_blocks)}\n"
+
+        yield '\n'
 
         for area in sorted(self.__areas.values(), key=lambda x: x._name):
-            theme_text += f'''
-################### AREA #####################
-area={area._name}
-\n'''
+            yield f'\n################### AREA #####################\narea={area._name}\n\n'
 
             for areaitem in area.get_items():
-                theme_text += f'''
-mode={areaitem.get_mode()}
-left_color={areaitem.get_left_color()}
-right_color={areaitem.get_right_color()}
-'''
-
-        return theme_text
+                yield (f'\nmode={areaitem.get_mode()}'
+                       f'\nleft_color={areaitem.get_left_color()}'
+                       f'\nright_color={areaitem.get_right_color()}\n')
 
     def add_area(self, area: Area) -> None:
         if area._name not in self.__areas:
@@ -70,29 +78,39 @@ right_color={areaitem.get_right_color()}
                         left_color: str,
                         right_color: str,
                         mode: str) -> None:
-        areaitem = self.__areas[area_name].get_item_at(column)
-        areaitem.set_left_color(left_color)
-        areaitem.set_right_color(right_color)
-        areaitem.set_mode(mode)
+        self.__areas[area_name].modify_item_at(column, left_color, right_color, mode)
 
     def delete_areaitem(self, area_name: str, column: int) -> None:
         area = self.__areas[area_name]
         area.remove_item_at(column)
 
-    def save(self) -> None:
+    def save(self, fsync: bool = False) -> None:
+        """
+            Write the theme to a temporary file that replaces the theme file, so a crash
+            never leaves a truncated theme (see `Theme.Saver` for the write-behind saves).
+
+            :param bool fsync: Flush the theme to the disk before replacing the file.
+        """
         # todo: is it possible that the root user (daemon) writes in a user dir?
 
-        if self.__path == "":
-            raise ValueError(f"Attempting to save a theme without a path")
+        write_theme_file(self.__path, self.get_data(), fsync)
+
+    def get_data(self) -> bytes:
+        """Return the content of the theme file, the format is picked by the extension of the path."""
 
-        theme_dir = os.path.dirname(self.__path)
-        os.makedirs(theme_dir, exist_ok=True)
+        if self.__path.endswith(_BINARY_EXTENSION):
+            return self.get_binary()
 
-        try:
-            with open(self.__path, encoding='utf-8', mode='w') as f:
-                f.write(self.__str__())
-        except FileNotFoundError as e:
-            raise ValueError(f"Theme could not be saved: \n{e}\n\n__path: {self.__path}")
+        return self.__str__().encode('utf-8')
+
+    def get_binary(self) -> bytes:
+        """Return the theme encoded in the binary format (see `Theme.binary`), the areas are sorted like in `__str__`."""
+
+        areas = [(area._name, [(areaitem.get_mode(), areaitem.get_left_color(), areaitem.get_right_color())
+                               for areaitem in area.get_items()])
+                 for area in sorted(self.__areas.values(), key=lambda x: x._name)]
+
+        return encode_theme(self.__speed, self.__power_blocks, areas)
 
     def get_name(self) -> str:
         return self.__name
@@ -100,6 +118,9 @@ right_color={areaitem.get_right_color()}
     def get_speed(self) -> int:
         return self.__speed
 
+    def get_power_blocks(self) -> tuple[str, ...]:
+        return self.__power_blocks
+
     def get_areas(self) -> tuple[Area, ...]:
         return tuple([area for area in self.__areas.values()])
 
@@ -116,12 +137,29 @@ right_color={areaitem.get_right_color()}
         """
         self.__speed = int(speed)
 
+    def set_power_blocks(self, power_blocks: list[str] | tuple[str, ...]) -> None:
+        """
+            Set the power states (see `Computer.get_power_blocks()`) that are programmed
+            with the colors of the theme, in addition to the boot block.
+        """
+
+        supported_power_blocks = self._computer.get_power_blocks()
+
+        names = []
+        for name in power_blocks:
+            if name not in supported_power_blocks:
+                print_warning(f"Unknown power block={name}")
+            elif name not in names:
+                names.append(name)
+
+        self.__power_blocks = tuple(names)
+
     def set_path(self, path: str) -> None:
 
-        if not path.endswith(".cfg"):
+        if not path.endswith((".cfg", _BINARY_EXTENSION)):
             path += ".cfg"
 
-        name = os.path.basename(path)[:-4]
+        name = os.path.splitext(os.path.basename(path))[0]
         if name == "":
             print_error(f"empty name for path={path}")
             return
@@ -131,3 +169,22 @@ right_color={areaitem.get_right_color()}
 
     def get_path(self):
         return self.__path
+
+
+def write_theme_file(path: str, data: bytes, fsync: bool = False) -> None:
+    """
+        Write the content of a theme (see `Theme.get_data`) atomically.
+
+        :raises ValueError: If the path is empty, or if the file can not be created.
+    """
+
+    if path == "":
+        raise ValueError("Attempting to save a theme without a path")
+
+    theme_dir = os.path.dirname(path)
+    os.makedirs(theme_dir, exist_ok=True)
+
+    try:
+        write_file_atomically(path, data, fsync)
+    except FileNotFoundError as e:
+        raise ValueError(f"Theme could not be saved: \n{e}\n\n__path: {path}")
@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""
+    Compact binary encoding of the themes (.akbt files), for the same model as the .cfg files:
+
+        header:     magic (b'AKBT'), version (u8), reserved (u8), speed (i32), areas (u16), items (u32)
+        power:      length (u8) + utf-8 names of the power blocks separated by '|'
+        area table: for each area, length (u8) + utf-8 name, items (u16)
+        items:      8 bytes for each AreaItem: mode (u8), forms (u8), left color (3 bytes),
+                    right color (3 bytes), in the order of the area table.
+
+    The "forms" keep how each color was written (#rrggbb, #RRGGBB, #rgb, #RGB), so a theme
+    converted from .cfg and back writes the same text. The colors with mixed case are written
+    in lower case. All the integers are little endian.
+"""
+
+import struct
+
+_BINARY_EXTENSION = '.akbt'
+_MAGIC = b'AKBT'
+_VERSION = 1
+
+_HEADER = struct.Struct('<4sBBiHI')
+_AREA_ITEMS = struct.Struct('<H')
+_ITEM = struct.Struct('<BB3s3s')
+
+_MODES = ('fixed', 'blink', 'morph')
+_MODE_CODES = {mode: code for code, mode in enumerate(_MODES)}
+
+# Forms of the colors
+_LOWER = 0
+_UPPER = 1
+_LOWER_SHORT = 2
+_UPPER_SHORT = 3
+
+
+def encode_theme(speed: int,
+                 power_blocks: tuple[str, ...],
+                 areas: list[tuple[str, list[tuple[str, str, str]]]]) -> bytes:
+    """
+        :param list areas: [(area name, [(mode, left_color, right_color), ...]), ...]
+        :raises ValueError: If a mode or a color is not valid.
+    """
+
+    items_count = sum(len(items) for _, items in areas)
+
+    data = bytearray(_HEADER.pack(_MAGIC, _VERSION, 0, speed, len(areas), items_count))
+    data += _encode_string('|'.join(power_blocks))
+
+    for name, items in areas:
+        data += _encode_string(name)
+        data += _AREA_ITEMS.pack(len(items))
+
+    for _, items in areas:
+        for mode, left_color, right_color in items:
+            if mode not in _MODE_CODES:
+                raise ValueError(f"Wrong mode={mode}")
+
+            left_form, left_rgb = _encode_color(left_color)
+            right_form, right_rgb = _encode_color(right_color)
+            data += _ITEM.pack(_MODE_CODES[mode], left_form | right_form << 2, left_rgb, right_rgb)
+
+    return bytes(data)
+
+
+def decode_theme(data: bytes | memoryview) -> tuple[int, tuple[str, ...], list[tuple[str, list[tuple[str, str, str]]]]]:
+    """
+        Return the (speed, power_blocks, areas) of the encoded theme, `data` can be a
+        view of a mapped file since the items are decoded without copying the buffer.
+
+        :raises ValueError: If the data is not a valid encoded theme.
+    """
+
+    data = memoryview(data)
+    if len(data) < _HEADER.size:
+        raise ValueError("The data is too short.")
+
+    magic, version, _, speed, areas_count, items_count = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError("The data is not an AKBL binary theme.")
+    elif version != _VERSION:
+        raise ValueError(f"Unsupported version={version}")
+
+    try:
+        offset = _HEADER.size
+        power_blocks, offset = _decode_string(data, offset)
+
+        area_table = []
+        for _ in range(areas_count):
+            name, offset = _decode_string(data, offset)
+            area_table.append((name, _AREA_ITEMS.unpack_from(data, offset)[0]))
+            offset += _AREA_ITEMS.size
+
+        items_end = offset + items_count * _ITEM.size
+        if items_end != len(data) or sum(count for _, count in area_table) != items_count:
+            raise ValueError("The items do not match the area table.")
+
+        items = [(_MODES[mode], _decode_color(forms & 0b11, left_rgb), _decode_color(forms >> 2 & 0b11, right_rgb))
+                 for mode, forms, left_rgb, right_rgb in _ITEM.iter_unpack(data[offset:items_end])]
+
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Corrupted binary theme: {e}")
+
+    areas = []
+    start = 0
+    for name, count in area_table:
+        areas.append((name, items[start:start + count]))
+        start += count
+
+    power_blocks = tuple(name for name in power_blocks.split('|') if name != '')
+
+    return speed, power_blocks, areas
+
+
+def _encode_string(text: str) -> bytes:
+    data = text.encode('utf-8')
+    if len(data) > 255:
+        raise ValueError(f"The text is too long={text}")
+
+    return bytes((len(data),)) + data
+
+
+def _decode_string(data: memoryview, offset: int) -> tuple[str, int]:
+    length = data[offset]
+    offset += 1
+    return str(data[offset:offset + length], 'utf-8'), offset + length
+
+
+def _encode_color(color: str) -> tuple[int, bytes]:
+
+    digits = color[1:]
+    if not color.startswith('#') or len(digits) not in (3, 6):
+        raise ValueError(f"Wrong color={color}")
+
+    if len(digits) == 3:
+        digits = ''.join(digit * 2 for digit in digits)
+        forms = (_LOWER_SHORT, _UPPER_SHORT)
+    else:
+        forms = (_LOWER, _UPPER)
+
+    form = forms[1] if digits == digits.upper() and digits != digits.lower() else forms[0]
+
+    return form, bytes.fromhex(digits)
+
+
+def _decode_color(form: int, rgb: bytes) -> str:
+
+    digits = rgb.hex()
+    if form in (_LOWER_SHORT, _UPPER_SHORT):
+        digits = digits[::2]
+
+    if form in (_UPPER, _UPPER_SHORT):
+        digits = digits.upper()
+
+    return '#' + digits
@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""
+    Differences between two themes of the same computer. A diff is a dictionary:
+
+        {'speed': None | new speed,
+         'power_blocks': None | [new power blocks],
+         'areas': {area name: [(operation, column, None | (mode, left_color, right_color)), ...]}}
+
+    The operations of an area are applied in order, and their columns are the ones of the
+    area when the operation is applied. Only the areas whose AreaItems changed are listed.
+
+    The diffs only contain built-in types, so they can be sent to the Daemon (the tuples
+    may be received as lists).
+"""
+
+from difflib import SequenceMatcher
+
+from utils import string_is_hex_color
+from Theme.Area import Area
+from Theme.Theme import Theme
+from Theme.AreaItem import AreaItem
+
+
+class DiffOperations:
+    _insert = 'insert'
+    _remove = 'remove'
+    _modify = 'modify'
+
+
+def diff_themes(old_theme: Theme, new_theme: Theme) -> dict:
+    """Return the diff that transforms `old_theme` into `new_theme`."""
+
+    diff = {'speed': None,
+            'power_blocks': None,
+            'areas': {}}
+
+    if old_theme.get_speed() != new_theme.get_speed():
+        diff['speed'] = new_theme.get_speed()
+
+    if old_theme.get_power_blocks() != new_theme.get_power_blocks():
+        diff['power_blocks'] = list(new_theme.get_power_blocks())
+
+    for new_area in new_theme.get_areas():
+        old_area = old_theme.get_area_by_name(new_area._name)
+        if old_area is new_area or (old_area is not None and old_area.has_same_items(new_area)):
+            continue
+
+        old_items = [] if old_area is None else _get_items(old_area)
+        new_items = _get_items(new_area)
+
+        if old_items != new_items:
+            diff['areas'][new_area._name] = _diff_items(old_items, new_items)
+
+    for old_area in old_theme.get_areas():
+        if new_theme.get_area_by_name(old_area._name) is None and len(old_area.get_items()) > 0:
+            diff['areas'][old_area._name] = [(DiffOperations._remove, column, None)
+                                             for column in reversed(range(len(old_area.get_items())))]
+
+    return diff
+
+
+def patch_theme(theme: Theme, diff: dict) -> None:
+    """
+        Apply a diff to a theme (it is modified).
+
+        :raises ValueError: If an operation does not match the AreaItems of the theme, or if
+                            a mode or a color is not valid.
+    """
+
+    if diff['speed'] is not None:
+        theme.set_speed(diff['speed'])
+
+    if diff['power_blocks'] is not None:
+        theme.set_power_blocks(diff['power_blocks'])
+
+    for area_name, operations in diff['areas'].items():
+        area = theme.get_area_by_name(area_name)
+        if area is None:
+            region = theme._computer.get_region_by_name(area_name)
+            if region is None:
+                raise ValueError(f"Unknown area={area_name}")
+
+            area = Area(region)
+            theme.add_area(area)
+
+        for operation, column, item in operations:
+            length = len(area.get_items())
+
+            match operation:
+                case DiffOperations._insert if 0 <= column <= length:
+                    mode, left_color, right_color = _check_item(item)
+                    area.insert_item_at(column, AreaItem(mode=mode, left_color=left_color, right_color=right_color))
+
+                case DiffOperations._remove if 0 <= column < length:
+                    area.remove_item_at(column)
+
+                case DiffOperations._modify if 0 <= column < length:
+                    mode, left_color, right_color = _check_item(item)
+                    theme.modify_areaitem(area_name, column, left_color, right_color, mode)
+
+                case _:
+                    raise ValueError(f"Wrong operation={operation} column={column} for area={area_name}")
+
+
+def diff_is_empty(diff: dict) -> bool:
+    return diff['speed'] is None and diff['power_blocks'] is None and len(diff['areas']) == 0
+
+
+def _check_item(item: tuple[str, str, str] | list[str]) -> tuple[str, str, str]:
+
+    if not isinstance(item, (tuple, list)) or len(item) != 3:
+        raise ValueError(f"Wrong AreaItem={item}")
+
+    mode, left_color, right_color = item
+    if mode not in ('fixed', 'morph', 'blink'):
+        raise ValueError(f"Wrong mode={mode}")
+
+    for color in (left_color, right_color):
+        if not string_is_hex_color(color):
+            raise ValueError(f"Wrong color={color}")
+
+    return mode, left_color, right_color
+
+
+def _get_items(area: Area) -> list[tuple[str, str, str]]:
+    return [areaitem.get_values() for areaitem in area.get_items()]
+
+
+def _diff_items(old_items: list[tuple[str, str, str]],
+                new_items: list[tuple[str, str, str]]) -> list[tuple[str, int, None | tuple[str, str, str]]]:
+    """
+        Return the operations of an area. The blocks of the matcher are processed from the
+        end, so the columns of the next operations are not shifted.
+    """
+
+    operations = []
+    matcher = SequenceMatcher(a=old_items, b=new_items, autojunk=False)
+
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag == 'equal':
+            continue
+
+        common = min(i2 - i1, j2 - j1)
+
+        for k in range(common):
+            operations.append((DiffOperations._modify, i1 + k, new_items[j1 + k]))
+
+        for column in reversed(range(i1 + common, i2)):
+            operations.append((DiffOperations._remove, column, None))
+
+        for k in range(common, j2 - j1):
+            operations.append((DiffOperations._insert, i1 + k, new_items[j1 + k]))
+
+    return operations
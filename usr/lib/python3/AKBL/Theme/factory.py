@@ -17,14 +17,16 @@
 #   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 import os
-from copy import deepcopy
+import mmap
 
-from utils import string_is_hex_color
 from settings import _MISSING_ZONE_COLOR
 from console_printer import print_warning, print_debug
 from Theme.Area import Area
 from Theme.Theme import Theme
 from Theme.AreaItem import AreaItem
+from Theme.Catalog import get_catalog
+from Theme.binary import decode_theme, _BINARY_EXTENSION
+from Theme.parser import parse_theme, get_report_text
 from Computer.Computer import Computer
 
 
@@ -37,91 +39,102 @@ def create_default_theme(computer: Computer, theme_dir: str = None) -> Theme:
     return new_theme
 
 
-def load_theme_from_file(computer: Computer, path: str) -> Theme:
-    print_debug('path="{}"'.format(path))
+def load_theme_from_file(computer: Computer, path: str) -> None | Theme:
+    """Load a theme, the binary themes are detected by their extension."""
 
-    theme = Theme(computer)
-    theme.set_path(path)
+    if path.endswith(_BINARY_EXTENSION):
+        return load_theme_from_binary_file(computer, path)
+
+    theme, report = parse_theme_file(computer, path)
+    if len(report) > 0:
+        print_warning(f"path={path}\n{get_report_text(report)}")
+
+    return theme
 
-    # Parse the configuration file
-    #
+
+def parse_theme_file(computer: Computer, path: str) -> tuple[Theme, list[dict]]:
+    """
+        Parse a .cfg theme, and return it with the report of its problems (see `Theme.parser`)
+        instead of logging them. The missing areas of the computer are added.
+    """
+
+    print_debug('path="{}"'.format(path))
 
     with open(path, encoding='utf-8', mode='rt') as f:
-        lines = f.readlines()
+        theme, report = parse_theme(computer, f, path)
+
+    _add_missing_areas(computer, theme, [area._name for area in theme.get_areas()])
+
+    return theme, report
+
+
+def load_theme_from_binary_file(computer: Computer, path: str) -> None | Theme:
+    """Load a theme encoded in the binary format, the file is mapped in memory."""
+
+    print_debug('path="{}"'.format(path))
+
+    try:
+        with open(path, mode='rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:  # ValueError: empty file
+        print_warning(f"The theme could not be loaded, path={path}: {e}")
+        return None
+
+    # The map is closed once the exception (and the views of its traceback) is released.
+    try:
+        speed, power_blocks, areas = decode_theme(data)
+    except ValueError as e:
+        print_warning(f"The theme could not be loaded, path={path}: {e}")
+        return None
+    finally:
+        data.close()
+
+    theme = Theme(computer)
+    theme.set_path(path)
+    theme.set_speed(speed)
+    theme.set_power_blocks(power_blocks)
 
-    area = None
-    left_color = ""
-    right_color = ""
-    mode = ""
     imported_areas = []
     supported_region_names = computer.get_regions_name()
-    print_debug(f'supported_region_names={supported_region_names}', direct_output=True)
-
-    for i, line in enumerate(lines, 1):
 
-        line = line.strip()
-        if line == "" or line.startswith("#"):
+    for area_name, items in areas:
+        if area_name not in supported_region_names:
+            print_warning(f"area._name {area_name} not listed on computer regions names")
             continue
 
-        line_data = line.split('=')
-        if len(line_data) != 2:
-            continue
+        imported_areas.append(area_name)
+        area = Area(computer.get_region_by_name(area_name))
+        theme.add_area(area)
 
-        var_name = line_data[0]
-        var_arg = line_data[1]
-
-        match var_name:
-
-            case 'speed':
-                theme.set_speed(int(var_arg))
-
-            case 'area':
-                if var_arg in supported_region_names:
-                    imported_areas.append(var_arg)
-                    region = computer.get_region_by_name(var_arg)
-                    area = Area(region)
-                    theme.add_area(area)
-                else:
-                    area = None
-                    print_warning(f"line {i}, area._name {var_arg} not listed on computer regions names")
-
-            case 'mode':
-                mode = var_arg
-                if mode not in ('fixed', 'morph', 'blink'):
-                    print_warning(
-                        f'line {i}, wrong mode={mode} when importing theme. Using default mode={computer.default_mode}')
-                    mode = computer.default_mode
-
-            case 'left_color':
-                if string_is_hex_color(var_arg):
-                    left_color = var_arg
-                else:
-                    print_warning(f"line {i}, un-valid left_color value={var_arg}")
-
-            case 'right_color':
-                if string_is_hex_color(var_arg):
-                    right_color = var_arg
-                else:
-                    print_warning(f"line {i}, un-valid right_color value={var_arg}")
-
-        if area is not None and left_color != "" and right_color != "" and mode != "":
-            print_debug(
-                f'Area={area._name}, loading AreaItem mode={mode}, left_color={left_color}, right_color={right_color}',
-                direct_output=True)
-
-            areaitem = AreaItem(mode=mode,
-                                left_color=left_color,
-                                right_color=right_color)
-            area.add_item(areaitem)
+        for mode, left_color, right_color in items:
+            area.add_item(AreaItem(mode=mode, left_color=left_color, right_color=right_color))
+
+    _add_missing_areas(computer, theme, imported_areas)
 
-            left_color = ""
-            right_color = ""
-            mode = ""
+    return theme
+
+
+def convert_theme_file(computer: Computer, source_path: str, target_path: str) -> None | Theme:
+    """
+        Convert a theme between the .cfg and the binary formats (the formats are
+        detected by the extensions), and return the saved theme.
+    """
+
+    theme = load_theme_from_file(computer, source_path)
+    if theme is None:
+        return None
+
+    new_theme = copy_theme(theme, target_path)
+    new_theme.save()
+
+    return new_theme
+
+
+def _add_missing_areas(computer: Computer, theme: Theme, imported_areas: list[str]) -> None:
+    """Add the regions of the computer that are not in the theme, with a default AreaItem."""
 
-    # Add areas in case they be missing
-    #
     warning_text = ""
-    for area_name in supported_region_names:
+    for area_name in computer.get_regions_name():
         if area_name not in imported_areas:
             region = computer.get_region_by_name(area_name)
             area = Area(region)
@@ -140,26 +153,29 @@ def load_theme_from_file(computer: Computer, path: str) -> Theme:
     if warning_text != "":
         print_warning(warning_text)
 
-    return theme
-
 
 def copy_theme(theme: Theme, path: str) -> Theme:
+    """Return a copy of the theme with another path, the AreaItems are shared until they are modified (see `Area.clone`)."""
+
     new_theme = Theme(computer=theme._computer)
     new_theme.set_path(path)
     new_theme.set_speed(theme.get_speed())
+    new_theme.set_power_blocks(theme.get_power_blocks())
 
     for area in theme.get_areas():
-        new_theme.add_area(deepcopy(area))
+        new_theme.add_area(area.clone())
 
     return new_theme
 
 
-def get_theme_names(path):
-    names = [filename[:-4] for filename in os.listdir(path) if filename.endswith('.cfg')]
-    names.sort()
-    #  names = [theme.get_name() for theme in _AVAILABLE_THEMES]
-    #  names.sort()
-    return names
+def watch_themes_dir(path) -> None:
+    """Keep the catalog of the directory updated with inotify, it should be used by the processes that stay open."""
+    get_catalog(path, watch=True)
+
+
+def get_theme_names(path) -> list[str]:
+    """Return the sorted names of the themes of the directory, from its catalog."""
+    return get_catalog(path).get_names()
 
 
 def get_theme_by_name(computer: Computer,
@@ -177,15 +193,5 @@ def get_theme_by_name(computer: Computer,
 
 
 def get_last_theme_name(path) -> None | str:
-    max_time = 0
-    theme_name = None
-
-    for filename in os.listdir(path):
-        if filename.endswith(".cfg"):
-            full_path = os.path.join(path, filename)
-            theme_time = os.path.getmtime(full_path)
-            if theme_time > max_time:
-                max_time = theme_time
-                theme_name = filename[:-4]
-
-    return theme_name
+    """Return the name of the last modified (or used) theme of the directory, from its catalog."""
+    return get_catalog(path).get_last_theme_name()
@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""
+    Theme packs: zip archives of .cfg themes with a `manifest.json` file,
+
+        {"version": 1, "themes": {"<name>.cfg": "<sha256 of the file>", ...}}
+
+    When a pack is imported, the checksums are verified and the themes are parsed (see
+    `Theme.parser`). Each theme is written to a temporary file that
+    replaces the theme file, so the Daemon never reads a partial theme.
+"""
+
+import os
+import json
+import zipfile
+import hashlib
+import tempfile
+
+from utils import write_file_atomically
+from Theme.parser import parse_theme
+from Theme.Catalog import get_catalog
+from Computer.Computer import Computer
+
+_PACK_VERSION = 1
+_MANIFEST_FILENAME = 'manifest.json'
+
+
+class PackStatus:
+    _imported = 'imported'
+    _exists = 'already_exists'
+    _missing = 'missing_file'
+    _checksum = 'wrong_checksum'
+    _name = 'wrong_name'
+    _encoding = 'wrong_encoding'
+
+
+def export_pack(themes_dir: str, pack_path: str, theme_names: None | list[str] = None) -> list[str]:
+    """
+        Write the themes (by default all the themes of the directory) to a pack,
+        and return the names of the exported themes.
+
+        :raises OSError: If a theme or the pack can not be read or written.
+    """
+
+    if theme_names is None:
+        theme_names = get_catalog(themes_dir).get_names()
+
+    manifest = {'version': _PACK_VERSION, 'themes': {}}
+    pack_dir, pack_filename = os.path.split(pack_path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{pack_filename}.", suffix='.tmp', dir=pack_dir or None)
+
+    try:
+        os.fchmod(fd, 0o644)
+
+        with os.fdopen(fd, mode='wb') as temp_file, \
+                zipfile.ZipFile(temp_file, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for theme_name in theme_names:
+                filename = theme_name + '.cfg'
+
+                with open(os.path.join(themes_dir, filename), mode='rb') as f:
+                    data = f.read()
+
+                manifest['themes'][filename] = hashlib.sha256(data).hexdigest()
+                archive.writestr(filename, data)
+
+            archive.writestr(_MANIFEST_FILENAME, json.dumps(manifest, indent=4))
+
+        os.replace(temp_path, pack_path)
+
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return list(theme_names)
+
+
+def import_pack(computer: Computer,
+                themes_dir: str,
+                pack_path: str,
+                overwrite: bool = False) -> list[dict]:
+    """
+        Import the themes of a pack, and return a report: a list of dictionaries
+        {theme, status, problems}, one for each theme of the manifest. The themes whose
+        lines have problems are imported with the same fallbacks as `load_theme_from_file`.
+
+        :raises ValueError: If the file is not a theme pack.
+    """
+
+    report = []
+    themes = []  # (filename, text)
+
+    try:
+        with zipfile.ZipFile(pack_path, mode='r') as archive:
+            manifest = json.loads(archive.read(_MANIFEST_FILENAME))
+
+            if not isinstance(manifest, dict) or manifest.get('version') != _PACK_VERSION or \
+                    not isinstance(manifest.get('themes'), dict):
+                raise ValueError(f"Unsupported manifest of the pack={pack_path}")
+
+            for filename, checksum in manifest['themes'].items():
+                status, text = _read_theme(archive, filename, checksum)
+                if status is None:
+                    themes.append((filename, text))
+                else:
+                    report.append({'theme': filename, 'status': status, 'problems': []})
+
+    except (OSError, KeyError, zipfile.BadZipFile, json.JSONDecodeError) as e:
+        raise ValueError(f"Wrong theme pack={pack_path}: {e}")
+
+    for filename, text in themes:
+        _, problems = parse_theme(computer, text.splitlines(), filename)
+        theme_path = os.path.join(themes_dir, filename)
+
+        if not overwrite and os.path.exists(theme_path):
+            status = PackStatus._exists
+        else:
+            write_file_atomically(theme_path, text.encode('utf-8'))
+            status = PackStatus._imported
+
+        report.append({'theme': filename, 'status': status, 'problems': problems})
+
+    return report
+
+
+def _read_theme(archive: zipfile.ZipFile, filename: str, checksum: str) -> tuple[None | str, None | str]:
+    """Return (None, text) of a theme, or (status, None) if it can not be imported."""
+
+    # The names can not be paths, they are joined to the themes directory.
+    if os.path.basename(filename) != filename or filename.startswith('.') or not filename.endswith('.cfg'):
+        return PackStatus._name, None
+
+    try:
+        data = archive.read(filename)
+    except KeyError:
+        return PackStatus._missing, None
+
+    if hashlib.sha256(data).hexdigest() != checksum:
+        return PackStatus._checksum, None
+
+    try:
+        return None, data.decode('utf-8')
+    except UnicodeDecodeError:
+        return PackStatus._encoding, None
+
@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""
+    Parser of the .cfg themes. The lines are read once, and each `key=value` line is
+    added to the theme as soon as it is read. The values are split on the first '='.
+
+    Instead of logging each bad line, the parser returns a report: a list of dictionaries
+    {line, problem, value}, one for each line that was ignored or modified.
+"""
+
+from typing import Iterable, Iterator
+
+from utils import string_is_hex_color
+from Theme.Area import Area
+from Theme.Theme import Theme
+from Theme.AreaItem import AreaItem
+from Computer.Computer import Computer
+
+
+class ParsingProblems:
+    _syntax = 'missing_equal_sign'
+    _unknown_key = 'unknown_key'
+    _speed = 'wrong_speed'
+    _power_block = 'unknown_power_block'
+    _area = 'unknown_area'
+    _mode = 'wrong_mode'
+    _color = 'wrong_color'
+    _no_area = 'areaitem_without_area'
+    _incomplete = 'incomplete_areaitem'
+
+
+_MODES = ('fixed', 'morph', 'blink')
+_IGNORED_KEYS = ('name',)
+
+
+def tokenize_theme(lines: Iterable[str]) -> Iterator[tuple[int, None | str, str]]:
+    """
+        Yield (line number, key, value) for each line that is not empty or a comment.
+        The key is None when the line has no '=', and the value is then the whole line.
+    """
+
+    for i, line in enumerate(lines, 1):
+
+        line = line.strip()
+        if line == "" or line.startswith("#"):
+            continue
+
+        key, separator, value = line.partition('=')
+        if separator == "":
+            yield i, None, line
+        else:
+            yield i, key.strip(), value.strip()
+
+
+def parse_theme(computer: Computer, lines: Iterable[str], path: str) -> tuple[Theme, list[dict]]:
+    """
+        Return the theme and the report of its problems. The areas of the computer that
+        are missing in the lines are not added (see `factory.load_theme_from_file`).
+    """
+
+    theme = Theme(computer)
+    theme.set_path(path)
+
+    report = []
+    supported_power_blocks = computer.get_power_blocks()
+
+    area = None
+    area_name = None  # Of the last area line, the AreaItems of the unknown areas are not reported
+    mode = ""
+    left_color = ""
+    right_color = ""
+    item_line = 0  # First line of the AreaItem that is being read
+
+    for i, key, value in tokenize_theme(lines):
+
+        match key:
+
+            case None:
+                _add_problem(report, i, ParsingProblems._syntax, value)
+
+            case 'speed':
+                try:
+                    theme.set_speed(int(value))
+                except ValueError:
+                    _add_problem(report, i, ParsingProblems._speed, value)
+
+            case 'power_blocks':
+                power_blocks = []
+                for name in value.split('|'):
+                    if name in supported_power_blocks:
+                        power_blocks.append(name)
+                    elif name != '':
+                        _add_problem(report, i, ParsingProblems._power_block, name)
+
+                theme.set_power_blocks(power_blocks)
+
+            case 'area':
+                if item_line > 0:
+                    _add_problem(report, item_line, ParsingProblems._incomplete, "")
+
+                mode = left_color = right_color = ""
+                item_line = 0
+                area_name = value
+
+                region = computer.get_region_by_name(value)
+                if region is None:
+                    area = None
+                    _add_problem(report, i, ParsingProblems._area, value)
+                else:
+                    area = Area(region)
+                    theme.add_area(area)
+
+            case 'mode' | 'left_color' | 'right_color':
+
+                if key == 'mode':
+                    if value in _MODES:
+                        mode = value
+                    else:
+                        _add_problem(report, i, ParsingProblems._mode, value)
+                        mode = computer.default_mode
+
+                elif not string_is_hex_color(value):
+                    _add_problem(report, i, ParsingProblems._color, value)
+                    continue
+
+                elif key == 'left_color':
+                    left_color = value
+                else:
+                    right_color = value
+
+                if item_line == 0:
+                    item_line = i
+
+                if mode != "" and left_color != "" and right_color != "":
+                    if area_name is None:
+                        _add_problem(report, item_line, ParsingProblems._no_area, "")
+                    elif area is not None:
+                        area.add_item(AreaItem(mode=mode, left_color=left_color, right_color=right_color))
+
+                    mode = left_color = right_color = ""
+                    item_line = 0
+
+            case _ if key in _IGNORED_KEYS:
+                pass
+
+            case _:
+                _add_problem(report, i, ParsingProblems._unknown_key, key)
+
+    if item_line > 0:
+        _add_problem(report, item_line, ParsingProblems._incomplete, "")
+
+    report.sort(key=lambda problem: problem['line'])
+
+    return theme, report
+
+
+def get_report_text(report: list[dict]) -> str:
+    return '\n'.join(f"line {problem['line']}: {problem['problem']}" +
+                     (f"={problem['value']}" if problem['value'] != "" else "") for problem in report)
+
+
+def _add_problem(report: list[dict], line: int, problem: str, value: str) -> None:
+    report.append({'line': line,
+                   'problem': problem,
+                   'value': value})
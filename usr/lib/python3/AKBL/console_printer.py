@@ -70,6 +70,11 @@ else:
 __LAST_OUTPUT_FUNC_DATA = ""  # Used to know if direct_output must be ignored
 
 
+def is_debug_enabled() -> bool:
+    """Used to avoid building expensive debug messages that will not be printed."""
+    return _DEBUG >= DebugCodes.Debug._value
+
+
 def print_error(message: str, direct_output=False) -> None:
     __print_message(message=message,
                     code_type=DebugCodes.Error._value,
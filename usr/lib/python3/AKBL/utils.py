@@ -18,6 +18,8 @@
 import os
 import re
 import pwd
+import stat
+import tempfile
 
 
 
@@ -34,3 +36,42 @@ def string_is_hex_color(string) -> bool:
         return True
 
     return False
+
+
+def write_file_atomically(path: str, data: bytes, fsync: bool = False) -> None:
+    """
+        Write the data to a temporary file of the same directory, then replace the file with it.
+        The readers get the old or the new content, never a partial file.
+
+        The temporary file is created by `mkstemp` (a random name opened with O_EXCL, so it can not
+        be a link prepared by another user), and it gets the permissions of the replaced file.
+
+        :param bool fsync: Flush the data to the disk before replacing the file.
+    """
+
+    try:
+        path_stat = os.lstat(path)
+    except FileNotFoundError:
+        mode = 0o644
+    else:
+        mode = stat.S_IMODE(path_stat.st_mode) if stat.S_ISREG(path_stat.st_mode) else 0o644
+
+    directory, filename = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{filename}.", suffix='.tmp', dir=directory or None)
+
+    try:
+        with os.fdopen(fd, mode='wb') as f:
+            os.fchmod(f.fileno(), mode)
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+        os.replace(temp_path, path)
+
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
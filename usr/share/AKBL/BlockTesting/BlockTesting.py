@@ -27,7 +27,6 @@ from gi.repository import Gtk
 
 from AKBL.Computer.Computer import Computer
 from AKBL.Engine.Driver import Driver
-from AKBL.Engine.Command import Command
 from AKBL.Engine.Controller import Controller
 from AKBL.utils import rgb_to_hex
 from AKBL.utils_akbl import get_alienware_device_info
@@ -210,15 +209,13 @@ class BlockTesting(Gtk.Window):
         command_value = self.entry_custom_command.get_text()
 
         try:
-            values = (int(val) for val in command_value.split(":"))
+            command = bytearray(int(val) for val in command_value.split(":"))
         except Exception:
             gtk_append_text_to_buffer(self.textbuffer_block_testing, '\n' + "WRONG FORMAT" + '\n')
             return
 
-        constructor = (Command("Custom", values),)
-
         try:
-            self.__driver.write_constructor(constructor)
+            self.__driver.write_commands((command,))
         except Exception:
             gtk_append_text_to_buffer(self.textbuffer_pyusb, '\n' + format_exc() + '\n')
             return
@@ -23,6 +23,7 @@ from time import sleep
 from gi.repository import Gtk, Gdk, GLib
 from gi.repository.GdkPixbuf import Pixbuf
 from threading import Thread, current_thread
+from concurrent.futures import ThreadPoolExecutor
 
 from AKBL import settings
 from AKBL.Texts import Texts
@@ -32,6 +33,8 @@ from AKBL.CCParser import CCParser
 from AKBL.console_printer import print_warning
 from AKBL.Computer.Computer import Computer
 from AKBL.Theme import factory as theme_factory
+from AKBL.Theme.Saver import Saver
+from AKBL.Theme.diff import diff_themes
 import AKBL.Computer.factory as computer_factory
 
 _SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
@@ -54,6 +57,10 @@ class MainWindow:
         self.__paths = Paths()
         self.__response = None
         self.__thread_scan_daemon = None
+        self.__theme_saver = Saver(fsync=True)  # Of the autosave, the changes are coalesced
+
+        # The previews are sent to the Daemon one by one, in the order of the edits.
+        self.__previews_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="AKBL-Previews")
 
         # Glade
         #
@@ -134,6 +141,7 @@ class MainWindow:
 
         self.label_computer_model.set_text(self.__computer.name)
 
+        theme_factory.watch_themes_dir(self.__paths._themes_dir)
         theme_name = theme_factory.get_last_theme_name(self.__paths._themes_dir)
         if theme_name is None:
             self.__theme = theme_factory.create_default_theme(self.__computer, self.__paths._themes_dir)
@@ -197,6 +205,8 @@ class MainWindow:
         if self.__thread_scan_daemon is not None:
             self.__thread_scan_daemon.do_run = False
             self.__thread_scan_daemon.join()
+        self.__previews_executor.shutdown(wait=False, cancel_futures=True)
+        self.__theme_saver.close()
         self.__application.quit()
 
     def on_toolbar_colorlist_changed(self, *_):
@@ -205,10 +215,19 @@ class MainWindow:
 
     def on_tempobutton_value_changed(self, _, value):
 
+        old_speed = self.__theme.get_speed()
         self.__theme.set_speed(255 - value)
 
+        # Preview the speed if the theme is lit
+        if self.__theme.get_speed() != old_speed:
+            self.__previews_executor.submit(self.__on_thread_apply_theme_diff,
+                                            self.__theme.get_name(),
+                                            {'speed': self.__theme.get_speed(),
+                                             'power_blocks': None,
+                                             'areas': {}})
+
         if self.checkbutton_autosave.get_active():
-            Thread(target=self.__on_thread_save_theme).start()
+            self.__theme_saver.save(self.__theme)
 
     def on_combobox_profiles_changed(self, widget, *_):
         tree_iter = widget.get_active_iter()
@@ -262,14 +281,29 @@ class MainWindow:
                                      right_color=areaitem_widget.get_right_color(),
                                      mode=areaitem_widget.get_mode())
 
+        # Preview the color if the theme is lit
+        self.__previews_executor.submit(self.__on_thread_modify_areaitem,
+                                        self.__theme.get_name(),
+                                        areaitem_widget.get_area_name(),
+                                        areaitem_widget.get_column(),
+                                        areaitem_widget.get_left_color(),
+                                        areaitem_widget.get_right_color(),
+                                        areaitem_widget.get_mode())
+
         if self.checkbutton_autosave.get_active():
-            Thread(target=self.__on_thread_save_theme).start()
+            self.__theme_saver.save(self.__theme)
 
     def on_areaitemwidget_request_delete(self, areaitem_widget):
 
+        old_theme = theme_factory.copy_theme(self.__theme, self.__theme.get_path())
         self.__theme.delete_areaitem(areaitem_widget.get_area_name(), areaitem_widget.get_column())
         areaitem_widget.destroy()
 
+        # Preview the deletion if the theme is lit
+        self.__previews_executor.submit(self.__on_thread_apply_theme_diff,
+                                        self.__theme.get_name(),
+                                        diff_themes(old_theme, self.__theme))
+
         # Reset the column of all the areaitem_widgets. This could be
         # improved by being done to only 1 box area.
         for box_area in self.box_areas:
@@ -282,7 +316,7 @@ class MainWindow:
         #
         #
         if self.checkbutton_autosave.get_active():
-            Thread(target=self.__on_thread_save_theme).start()
+            self.__theme_saver.save(self.__theme)
 
     def on_checkbutton_delete_warning_activate(self, *_):
         self.__ccp.write('delete_warning', self.checkbutton_delete_warning.get_active())
@@ -323,9 +357,15 @@ class MainWindow:
                                                                         Texts.GUI._theme_duplicate):
             return
 
+        # Show all the problems of the file at once, before importing it.
+        theme, report = theme_factory.parse_theme_file(self.__computer, file_path)
+        if len(report) > 0 and not gtk_dialog_question(self.window_root,
+                                                       Texts.GUI._theme_import_problems,
+                                                       theme_factory.get_report_text(report)):
+            return
+
         shutil.copy(file_path, destination_path)
 
-        theme = theme_factory.load_theme_from_file(self.__computer, destination_path)
         self.__populate_liststore_themes(sel_theme_name=theme.get_name())
 
     def on_menuitem_export_activate(self, *_):
@@ -515,6 +555,8 @@ class MainWindow:
 
     def __on_thread_delete_current_configuration(self):
 
+        self.__theme_saver.discard(self.__theme.get_path())
+
         if os.path.exists(self.__theme.get_path()):
             os.remove(self.__theme.get_path())
 
@@ -525,8 +567,15 @@ class MainWindow:
         self.__bindings.reload_themes()
 
     def __on_thread_apply_theme(self):
+        self.__theme_saver.flush()
         self.__bindings.set_theme(self.__theme.get_name())
 
+    def __on_thread_modify_areaitem(self, theme_name, area_name, column, left_color, right_color, mode):
+        self.__bindings.modify_areaitem(theme_name, area_name, column, left_color, right_color, mode)
+
+    def __on_thread_apply_theme_diff(self, theme_name, diff):
+        self.__bindings.apply_theme_diff(theme_name, diff)
+
     def __on_thread_set_lights(self, status):
         self.__bindings.set_lights(status)
 
@@ -58,6 +58,7 @@ class Indicator:
 
         self.__paths = Paths()
         self.__current_code = -1
+        factory.watch_themes_dir(self.__paths._themes_dir)
 
         if white:
             suffix = "-white"
@@ -49,6 +49,39 @@ def process_args(args):
         case '--ping':
             print(akbl_bindings.ping())
 
+        case '--list-themes':
+            for theme_name in akbl_bindings.get_themes_name():
+                print(theme_name)
+
+        case '--export-pack':
+            if len(args) != 3:
+                print(Texts.Commands._wrong_argument)
+                return
+
+            theme_names = akbl_bindings.export_theme_pack(args[2])
+            if theme_names is None:
+                print(Texts.Commands._pack_error)
+            else:
+                print(Texts.Commands._pack_exported.format(len(theme_names), args[2]))
+
+        case '--import-pack':
+            if len(args) not in (3, 4) or (len(args) == 4 and args[3] != '--overwrite'):
+                print(Texts.Commands._wrong_argument)
+                return
+
+            report = akbl_bindings.import_theme_pack(args[2], overwrite=len(args) == 4)
+            if report is None:
+                print(Texts.Commands._pack_error)
+                return
+
+            for theme_report in report:
+                print(f"{theme_report['theme']}: {theme_report['status']}")
+                for problem in theme_report['problems']:
+                    print(f"    line {problem['line']}: {problem['problem']} {problem['value']}".rstrip())
+
+            imported = sum(1 for theme_report in report if theme_report['status'] == 'imported')
+            print(Texts.Commands._pack_imported.format(imported, len(report)))
+
         case '--off' | '--on' | '--switch' | '--set-theme':
 
             if not akbl_bindings.ping():
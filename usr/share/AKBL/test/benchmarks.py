@@ -0,0 +1,386 @@
+#!/usr/bin/python3
+#
+
+#  Copyright (C) 2026 Rafael Senties Martinelli.
+#
+#  AKBL is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License 3 as published by
+#   the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software Foundation,
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""
+    Micro-benchmarks of the Engine. They do not need an Alienware device,
+    the commands are consumed by a fake USB sink.
+
+        python3 benchmarks.py
+"""
+
+import os
+import random
+import timeit
+import tempfile
+import tracemalloc
+from copy import deepcopy
+
+from AKBL.Computer.Computer import Computer  # It also adds the AKBL directory to sys.path
+from AKBL.Computer.Region import Region
+from AKBL.Engine.Constructor import Constructor
+from AKBL.Engine.Controller import Controller
+from AKBL.Engine.Constructor import _LEFT_COLOR_BYTES, _RIGHT_COLOR_BYTES, _to_rgb444
+from AKBL.Theme import factory as theme_factory
+from AKBL.Theme.Theme import Theme
+from AKBL.Theme.Area import Area
+from AKBL.Theme.AreaItem import AreaItem
+from AKBL.Theme.diff import diff_themes, patch_theme
+
+_REGION_HEX_IDS = (1, 2, 4, 8, 32, 64, 128, 256, 512, 7168, 8192)
+_COLORS = ('#FF0000', '#00FF00', '#0000FF')
+
+
+def get_computer() -> Computer:
+    computer = Computer()
+    computer.name = "Benchmark"
+
+    for i, hex_id in enumerate(_REGION_HEX_IDS):
+        computer.add_region(Region(name=f"R{i}",
+                                   description=f"Region {i}",
+                                   hex_id=hex_id,
+                                   max_commands=15,
+                                   can_blink=True,
+                                   can_morph=True,
+                                   can_light=True))
+
+    return computer
+
+
+def apply_theme(computer: Computer, constructor: Constructor) -> int:
+    """Build the same stream as the Daemon does for a theme, and consume it as the Driver."""
+
+    for save, block in ((True, computer.block_load_on_boot), (False, computer.block_load_on_boot)):
+        constructor.set_block(save, block)
+        constructor.set_speed(100)
+        for region in computer.get_regions():
+            for color in _COLORS:
+                constructor.add_morph_areaitem(region._hex_id, color, color)
+            constructor.set_end_colors_line()
+        constructor.set_end_block_line()
+
+    sent_bytes = 0
+    for command in constructor:
+        sent_bytes += len(command)
+
+    return sent_bytes
+
+
+def benchmark_constructor(number: int = 2000) -> None:
+    computer = get_computer()
+    constructor = Constructor(computer)
+    apply_theme(computer, constructor)  # warm up the arena
+
+    seconds = timeit.timeit(lambda: (constructor.clear(), apply_theme(computer, constructor)), number=number)
+
+    tracemalloc.start()
+    constructor.clear()
+    tracemalloc.reset_peak()
+    current, _ = tracemalloc.get_traced_memory()
+    apply_theme(computer, constructor)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("Constructor apply:")
+    print(f"\tcommands per apply = {len(constructor)}")
+    print(f"\ttime per apply     = {seconds / number * 1e6:.1f} µs")
+    print(f"\tmemory allocated   = {peak - current} bytes")
+
+
+def encode_colors_without_table(colors: list[str]) -> list[tuple[int, int, int, int]]:
+    """The color encoding of the Constructor before the RGB444 lookup table."""
+
+    encoded = []
+    for color in colors:
+        color = color.replace("#", '')
+
+        r = int(color[0:2], 16) // 16
+        g = int(color[2:4], 16) // 16
+        b = int(color[4:6], 16) // 16
+
+        encoded.append((r * 16 + g, b * 16, r, g * 16 + b))
+
+    return encoded
+
+
+def encode_colors_with_table(colors: list[str]) -> list[tuple[int, int, int, int]]:
+
+    encoded = []
+    for color in colors:
+        rgb444 = _to_rgb444(color)
+        encoded.append(_LEFT_COLOR_BYTES[rgb444] + _RIGHT_COLOR_BYTES[rgb444])
+
+    return encoded
+
+
+def benchmark_color_encoding(items: int = 10000, number: int = 20) -> None:
+    """Encode a stream of `items` colors, picked from a palette of 256 colors like in the themes."""
+
+    randomizer = random.Random(0)
+    palette = ['#{:06X}'.format(randomizer.randrange(0x1000000)) for _ in range(256)]
+    colors = [randomizer.choice(palette) for _ in range(items)]
+
+    if encode_colors_without_table(colors) != encode_colors_with_table(colors):
+        print("Error: the color encodings are different.")
+        return
+
+    old_seconds = timeit.timeit(lambda: encode_colors_without_table(colors), number=number)
+    new_seconds = timeit.timeit(lambda: encode_colors_with_table(colors), number=number)
+
+    print(f"Color encoding ({items} items):")
+    print(f"	without table = {old_seconds / number * 1e3:.2f} ms")
+    print(f"	with table    = {new_seconds / number * 1e3:.2f} ms")
+
+
+def benchmark_frame(slots: int = 15, number: int = 2000) -> None:
+    """Compile a frame with `slots` morph colors for each region, with `Constructor.add_frame`."""
+
+    try:
+        import numpy
+    except ImportError:
+        print("Frame encoding: numpy is not installed, skipping.")
+        return
+
+    computer = get_computer()
+    constructor = Constructor(computer)
+
+    randomizer = numpy.random.default_rng(0)
+    region_hex_ids = numpy.array(_REGION_HEX_IDS)
+    modes = numpy.full((len(_REGION_HEX_IDS), slots), computer.command_set_morph_color)
+    left_colors = randomizer.integers(0, 256, (len(_REGION_HEX_IDS), slots, 3), dtype=numpy.uint8)
+    right_colors = randomizer.integers(0, 256, (len(_REGION_HEX_IDS), slots, 3), dtype=numpy.uint8)
+
+    seconds = timeit.timeit(lambda: (constructor.clear(),
+                                     constructor.add_frame(region_hex_ids, modes, left_colors, right_colors),
+                                     len(constructor)),
+                            number=number)
+
+    print(f"Frame encoding ({len(_REGION_HEX_IDS)} regions x {slots} slots):")
+    print(f"\ttime per frame = {seconds / number * 1e6:.1f} µs")
+
+
+def benchmark_theme_formats(items: int = 200, number: int = 20) -> None:
+    """Load a theme with `items` AreaItems per region, saved in the .cfg and in the binary format."""
+
+    computer = get_computer()
+    randomizer = random.Random(0)
+
+    theme = Theme(computer)
+    for region in computer.get_regions():
+        area = Area(region)
+        theme.add_area(area)
+        for _ in range(items):
+            area.add_item(AreaItem(mode=randomizer.choice(('fixed', 'blink', 'morph')),
+                                   left_color='#{:06x}'.format(randomizer.randrange(0x1000000)),
+                                   right_color='#{:06x}'.format(randomizer.randrange(0x1000000))))
+
+    with tempfile.TemporaryDirectory() as themes_dir:
+        sizes = {}
+        seconds = {}
+        texts = []
+
+        for extension in ('.cfg', '.akbt'):
+            path = os.path.join(themes_dir, 'Benchmark' + extension)
+            theme_factory.copy_theme(theme, path).save()
+
+            sizes[extension] = os.path.getsize(path)
+            seconds[extension] = timeit.timeit(lambda: theme_factory.load_theme_from_file(computer, path),
+                                               number=number)
+            texts.append(str(theme_factory.load_theme_from_file(computer, path)))
+
+    if texts[0] != texts[1]:
+        print("Error: the theme formats are different.")
+        return
+
+    print(f"Theme formats ({len(computer.get_regions())} regions x {items} items):")
+    for extension in ('.cfg', '.akbt'):
+        print(f"\t{extension:5} = {seconds[extension] / number * 1e3:.2f} ms, {sizes[extension]} bytes")
+
+
+def benchmark_theme_diff(regions: int = 100, items: int = 4, number: int = 1000) -> None:
+    """Diff two themes of `regions` areas with one modified AreaItem, and patch the first one."""
+
+    computer = Computer()
+    for i in range(regions):
+        computer.add_region(Region(name=f"R{i}",
+                                   description=f"Region {i}",
+                                   hex_id=i + 1,
+                                   max_commands=15,
+                                   can_blink=True,
+                                   can_morph=True,
+                                   can_light=True))
+
+    randomizer = random.Random(0)
+    old_theme = Theme(computer)
+    for region in computer.get_regions():
+        area = Area(region)
+        old_theme.add_area(area)
+        for _ in range(items):
+            area.add_item(AreaItem(mode='fixed',
+                                   left_color='#{:06x}'.format(randomizer.randrange(0x1000000)),
+                                   right_color='#{:06x}'.format(randomizer.randrange(0x1000000))))
+
+    new_theme = theme_factory.copy_theme(old_theme, "")
+    new_theme.modify_areaitem(f"R{regions // 2}", 0, '#000000', '#000000', 'morph')
+
+    diff = diff_themes(old_theme, new_theme)
+    patched_theme = theme_factory.copy_theme(old_theme, "")
+    patch_theme(patched_theme, diff)
+    if str(patched_theme) != str(new_theme):
+        print("Error: the patched theme is different.")
+        return
+
+    diff_seconds = timeit.timeit(lambda: diff_themes(old_theme, new_theme), number=number)
+    patch_seconds = timeit.timeit(lambda: patch_theme(patched_theme, diff), number=number)
+
+    print(f"Theme diff ({regions} areas x {items} items):")
+    print(f"\tdiff  = {diff_seconds / number * 1e6:.1f} µs")
+    print(f"\tpatch = {patch_seconds / number * 1e6:.1f} µs")
+
+
+def deepcopy_theme(theme: Theme, path: str) -> Theme:
+    """The previous `factory.copy_theme`, that copied all the AreaItems."""
+
+    new_theme = Theme(computer=theme._computer)
+    new_theme.set_path(path)
+    new_theme.set_speed(theme.get_speed())
+    new_theme.set_power_blocks(theme.get_power_blocks())
+
+    for area in theme.get_areas():
+        new_theme.add_area(deepcopy(area))
+
+    return new_theme
+
+
+def benchmark_theme_copy(items: int = 15, copies: int = 100, number: int = 20) -> None:
+    """Copy a theme with `items` AreaItems per region `copies` times, and modify one AreaItem of each copy."""
+
+    computer = get_computer()
+    theme = Theme(computer)
+    for region in computer.get_regions():
+        area = Area(region)
+        theme.add_area(area)
+        for _ in range(items):
+            area.add_item(AreaItem(mode='fixed', left_color='#ff0000', right_color='#00ff00'))
+
+    def copy_themes(copy_function) -> list[Theme]:
+        themes = [copy_function(theme, f"/tmp/Copy{i}.cfg") for i in range(copies)]
+        for new_theme in themes:
+            new_theme.modify_areaitem("R0", 0, '#0000ff', '#0000ff', 'blink')
+        return themes
+
+    print(f"Theme copies ({copies} copies of {len(computer.get_regions())} regions x {items} items):")
+
+    for label, copy_function in (("deepcopy", deepcopy_theme), ("shared  ", theme_factory.copy_theme)):
+        seconds = timeit.timeit(lambda: copy_themes(copy_function), number=number)
+
+        tracemalloc.start()
+        current, _ = tracemalloc.get_traced_memory()
+        themes = copy_themes(copy_function)
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del themes
+
+        print(f"\t{label} = {seconds / number * 1e3:.2f} ms, {after - current} bytes")
+
+
+def illuminate(computer: Computer, controller: Controller, colors: list[str]) -> int:
+    """Apply a theme like `Daemon.__illuminate_keyboard` (boot block, then live block), and return the uploaded commands."""
+
+    controller.clear_constructor()
+    for save, block in ((True, computer.block_load_on_boot), (False, computer.block_load_on_boot)):
+        controller.add_block_line(save=save, block=block)
+        controller.add_reset_line(computer.reset_all_lights_on)
+        controller.add_speed_line(100)
+        for region, color in zip(computer.get_regions(), colors):
+            for _ in range(3):
+                controller.add_color_line(region._hex_id, 'fixed', color, color)
+            controller.end_colors_line()
+        controller.end_block_line()
+
+    controller.apply_config()
+
+    return controller.get_last_apply_commands()
+
+
+def benchmark_daemon_apply() -> None:
+    """Apply a theme to a fake device, then the same theme with one region modified, with and without delta uploads."""
+
+    computer = get_computer()
+    colors = ['#{:02x}0000'.format(16 * (i + 1)) for i in range(len(computer.get_regions()))]
+    new_colors = ['#00ff00'] + colors[1:]
+
+    print("Daemon apply (fake device, commands uploaded):")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for label, delta_uploads in (("full ", False), ("delta", True)):
+            saved_blocks_file = os.path.join(directory, f"{label.strip()}.ini")
+            open(saved_blocks_file, mode='w').close()
+
+            controller = Controller(computer,
+                                    fake=True,
+                                    delta_uploads=delta_uploads,
+                                    saved_blocks_file=saved_blocks_file,
+                                    coalesce_regions=True)
+
+            first = illuminate(computer, controller, colors)
+            modified = illuminate(computer, controller, new_colors)
+            unchanged = illuminate(computer, controller, new_colors)
+
+            print(f"\t{label} = first apply {first}, one region modified {modified}, unchanged {unchanged}")
+
+
+def benchmark_coalesced_patches(number: int = 100) -> None:
+    """
+        Count the regions that the Daemon can patch when the regions are coalesced, i.e. the regions
+        that still have a loop of their own. The other regions fall back to a full apply.
+    """
+
+    computer = get_computer()
+    regions = computer.get_regions()
+    controller = Controller(computer, fake=True, delta_uploads=True, coalesce_regions=True)
+    random.seed(0)
+
+    print(f"Coalesced regions ({len(regions)} regions, {number} random themes per palette):")
+
+    palette = ['#{:02x}{:02x}00'.format(16 * (i + 1), 255 - 16 * i) for i in range(len(regions))]
+
+    for label, palette_size in (("1 color", 1), ("2 colors", 2), ("4 colors", 4), ("a color per region", None)):
+        patchable = 0
+
+        for _ in range(number):
+            if palette_size is None:
+                colors = random.sample(palette, len(regions))
+            else:
+                colors = random.choices(palette[:palette_size], k=len(regions))
+
+            illuminate(computer, controller, colors)
+            loops_regions = set(controller.get_committed_loops_regions(computer.block_load_on_boot))
+            patchable += sum((region._hex_id,) * 3 in loops_regions for region in regions)
+
+        print(f"\t{label} = {100 * patchable / (number * len(regions)):.1f}% patchable regions")
+
+
+if __name__ == '__main__':
+    benchmark_constructor()
+    benchmark_color_encoding()
+    benchmark_frame()
+    benchmark_theme_formats()
+    benchmark_theme_diff()
+    benchmark_theme_copy()
+    benchmark_daemon_apply()
+    benchmark_coalesced_patches()